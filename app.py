@@ -1,6 +1,6 @@
 import os
 import yaml
-from flask import Flask, render_template, request
+from flask import Flask, jsonify, render_template, request
 from sqlalchemy import event
 from flask_socketio import SocketIO
 import temperature
@@ -14,6 +14,8 @@ from robot import robot_blueprint  # Neuer Import
 from calendar_routes import create_calendar_blueprint
 from games import games_blueprint
 from extensions import db
+from migrations import register_migration_commands, upgrade_database
+import models  # noqa: F401 - registers every table before the schema upgrade
 
 
 app = Flask(__name__)
@@ -38,6 +40,10 @@ def _set_sqlite_pragma(dbapi_connection, _connection_record):
 
 with app.app_context():
     event.listen(db.engine, 'connect', _set_sqlite_pragma)
+    # Tables and indexes must exist before the blueprints seed their caches.
+    upgrade_database(db, app.logger)
+
+register_migration_commands(app, db)
 
 
 def _load_power_devices_from_config():
@@ -54,11 +60,15 @@ def _load_power_devices_from_config():
         ip = (props or {}).get('ip')
         if not ip:
             continue
-        devices.append({
+        device = {
             'id': device_id,
             'name': props.get('name') or device_id,
             'url': f"http://{ip}/rpc/Switch.GetStatus?id=0",
-        })
+            'poll_interval': props.get('poll_interval'),
+        }
+        if 'compression' in props:
+            device['compression'] = props['compression']
+        devices.append(device)
 
     return devices or None
 
@@ -106,9 +116,13 @@ def video_streams():
     )
 
 
+@app.route('/get_retention_stats')
+def get_retention_stats():
+    engine = app.extensions.get('retention')
+    return jsonify(engine.stats() if engine else {})
+
+
 if __name__ == '__main__':
-    with app.app_context():
-        db.create_all()
     socketio.run(
         app,
         host='0.0.0.0',
@@ -2,6 +2,7 @@ import io
 import os
 import threading
 import datetime
+import time
 
 import numpy as np
 import cv2
@@ -9,7 +10,9 @@ from flask import Blueprint, Response, render_template, request
 
 import picamera
 import tflite_runtime.interpreter as tflite
-from typing import Optional, List
+from typing import List
+
+from frame_bus import FrameBus
 
 # -----------------------------------------------------------------------------
 # CONFIGURATION
@@ -32,12 +35,20 @@ _SKELETON_EDGES = [
 
 camera_blueprint = Blueprint('camera', __name__, template_folder='templates')
 
-latest_frame_jpeg: Optional[bytes] = None
+frame_bus = FrameBus()
 recording = False
 FRAMES_BUFFER: List[np.ndarray] = []
 landmark_detection_enabled = False
 lock = threading.Lock()
 
+# Per-frame CPU time of the camera thread, split by pipeline mode.
+FRAME_STATS_SMOOTHING = 0.05
+frame_stats = {
+    "mode": None,
+    "passthrough": {"frames": 0, "avg_cpu_ms": None, "last_cpu_ms": None},
+    "decode": {"frames": 0, "avg_cpu_ms": None, "last_cpu_ms": None},
+}
+
 RECORD_FLAG_FILE = 'record_flag.txt'
 VIDEOS_FOLDER = 'static/videos'
 os.makedirs(VIDEOS_FOLDER, exist_ok=True)
@@ -81,33 +92,53 @@ def _draw_landmarks(frame_bgr: np.ndarray, keypoints: np.ndarray):
             cv2.line(frame_bgr, points[i][:2], points[j][:2], (0, 255, 255), 1)
 
 
+def _record_frame_cost(mode: str, cpu_seconds: float):
+    cpu_ms = cpu_seconds * 1000
+    with lock:
+        stats = frame_stats[mode]
+        stats["frames"] += 1
+        stats["last_cpu_ms"] = round(cpu_ms, 3)
+        if stats["avg_cpu_ms"] is None:
+            stats["avg_cpu_ms"] = round(cpu_ms, 3)
+        else:
+            stats["avg_cpu_ms"] = round(stats["avg_cpu_ms"] + FRAME_STATS_SMOOTHING * (cpu_ms - stats["avg_cpu_ms"]), 3)
+        frame_stats["mode"] = mode
+
+
 def camera_stream_thread():
-    global latest_frame_jpeg, recording, FRAMES_BUFFER
+    global recording, FRAMES_BUFFER
     with picamera.PiCamera(resolution=(320, 240), framerate=20) as camera:
         stream = io.BytesIO()
         for _ in camera.capture_continuous(stream, format='jpeg', use_video_port=True):
+            frame_started = time.thread_time()
             stream.seek(0)
             jpeg_data = stream.read()
             stream.seek(0)
             stream.truncate()
 
-            img_bgr = cv2.imdecode(np.frombuffer(jpeg_data, dtype=np.uint8), cv2.IMREAD_COLOR)
-            img_rgb = cv2.cvtColor(img_bgr, cv2.COLOR_BGR2RGB)
-
             with lock:
-                if landmark_detection_enabled:
+                landmarks = landmark_detection_enabled
+            record = is_recording()
+
+            if not landmarks and not record:
+                # Passthrough: nothing needs pixels, so publish the camera's JPEG as is.
+                mode = "passthrough"
+                img_bgr = None
+            else:
+                mode = "decode"
+                img_bgr = cv2.imdecode(np.frombuffer(jpeg_data, dtype=np.uint8), cv2.IMREAD_COLOR)
+                if landmarks:
+                    img_rgb = cv2.cvtColor(img_bgr, cv2.COLOR_BGR2RGB)
                     keypoints = _movenet_detect_landmarks(img_rgb)
                     _draw_landmarks(img_bgr, keypoints)
+                    ret, jpg_annotated = cv2.imencode('.jpg', img_bgr, [int(cv2.IMWRITE_JPEG_QUALITY), 80])
+                    if not ret:
+                        continue
+                    jpeg_data = jpg_annotated.tobytes()
 
-            ret, jpg_annotated = cv2.imencode('.jpg', img_bgr, [int(cv2.IMWRITE_JPEG_QUALITY), 80])
-            if not ret:
-                continue
-            jpeg_data_annotated = jpg_annotated.tobytes()
+            frame_bus.publish(jpeg_data)
 
-            with lock:
-                latest_frame_jpeg = jpeg_data_annotated
-
-            if is_recording():
+            if record:
                 if not recording:
                     FRAMES_BUFFER = []
                     recording = True
@@ -120,6 +151,8 @@ def camera_stream_thread():
                 save_video(FRAMES_BUFFER, filepath)
                 FRAMES_BUFFER = []
 
+            _record_frame_cost(mode, time.thread_time() - frame_started)
+
 
 threading.Thread(target=camera_stream_thread, daemon=True).start()
 
@@ -132,9 +165,11 @@ def camera_page():
 @camera_blueprint.route('/stream')
 def stream():
     def generate():
+        seq = 0
         while True:
-            with lock:
-                frame = latest_frame_jpeg
+            # Sleeps until the camera publishes a newer frame; a client that
+            # fell behind gets the newest one and skips the rest.
+            seq, frame = frame_bus.wait_for_frame(seq)
             if frame:
                 yield (b'--frame\r\n'
                        b'Content-Type: image/jpeg\r\n\r\n' + frame + b'\r\n')
@@ -171,3 +206,17 @@ def toggle_landmarks():
     with lock:
         landmark_detection_enabled = not landmark_detection_enabled
     return {"landmark_detection": landmark_detection_enabled}
+
+
+@camera_blueprint.route('/get_camera_stats')
+def get_camera_stats():
+    with lock:
+        stats = {
+            "mode": frame_stats["mode"],
+            "passthrough": dict(frame_stats["passthrough"]),
+            "decode": dict(frame_stats["decode"]),
+        }
+    stats["landmark_detection"] = landmark_detection_enabled
+    stats["recording"] = is_recording()
+    stats["stream"] = frame_bus.stats()
+    return stats
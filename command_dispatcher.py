@@ -0,0 +1,133 @@
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+COMMAND_WORKERS = 4
+_OPPOSITE = {"on": "off", "off": "on"}
+
+
+def coalesce(pending: Optional[str], command: str) -> Optional[str]:
+    """Merge a new command into the one still waiting to be sent.
+
+    Explicit states win over everything before them. A toggle flips a
+    pending explicit state, and two pending toggles cancel out, so a
+    burst of clicks ends in the same state as sending every one of them.
+    """
+    if command != "toggle" or pending is None:
+        return command
+    if pending == "toggle":
+        return None
+    return _OPPOSITE.get(pending, "toggle")
+
+
+class _DeviceChannel:
+    def __init__(self):
+        self.pending: Optional[str] = None
+        self.has_pending = False
+        # Futures of every caller whose command is merged into ``pending``.
+        self.waiters: List[Future] = []
+        self.busy = False
+        self.sent = 0
+        self.coalesced = 0
+        self.failures = 0
+
+        # One keep-alive connection per device; the ESPs and Shellys only
+        # serve a few sockets, and reusing one saves the TCP handshake.
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=1, max_retries=0)
+        self.session.mount("http://", adapter)
+
+
+class CommandDispatcher:
+    """Per-device command queues with latest-wins coalescing.
+
+    ``submit`` only records the command and returns. One worker per device
+    at a time sends the coalesced command through that device's session
+    with ``handler(session, key, command)``; commands that arrive while a
+    send is in flight are merged and sent afterwards. Callers that need the
+    outcome pass a ``Future``; it gets the handler's result for the merged
+    command it ended up in.
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[requests.Session, str, str], Any],
+        max_workers: int = COMMAND_WORKERS,
+        logger=None,
+    ):
+        self._handler = handler
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="device-command")
+        self._channels: Dict[str, _DeviceChannel] = {}
+        self._lock = threading.Lock()
+        self._logger = logger
+
+    def submit(self, key: str, command: str, waiter: Optional[Future] = None) -> bool:
+        """Queue ``command`` for ``key``; returns True if it merged with a pending one."""
+        with self._lock:
+            channel = self._channels.get(key)
+            if channel is None:
+                channel = self._channels[key] = _DeviceChannel()
+            merged = channel.has_pending
+            if merged:
+                channel.coalesced += 1
+            channel.pending = coalesce(channel.pending if merged else None, command)
+            channel.has_pending = True
+            if waiter is not None:
+                channel.waiters.append(waiter)
+            if not channel.busy:
+                channel.busy = True
+                self._executor.submit(self._drain, key, channel)
+        return merged
+
+    def has_pending(self, key: str) -> bool:
+        with self._lock:
+            channel = self._channels.get(key)
+            return bool(channel and channel.has_pending)
+
+    def _drain(self, key: str, channel: _DeviceChannel):
+        while True:
+            with self._lock:
+                if not channel.has_pending:
+                    channel.busy = False
+                    return
+                command, channel.pending, channel.has_pending = channel.pending, None, False
+                waiters, channel.waiters = channel.waiters, []
+            if command is None:
+                # A burst of toggles cancelled itself out.
+                for waiter in waiters:
+                    waiter.set_result(None)
+                continue
+            try:
+                result = self._handler(channel.session, key, command)
+                channel.sent += 1
+            except Exception as exc:
+                channel.failures += 1
+                if self._logger:
+                    self._logger.exception("Command %s for %s failed", command, key)
+                for waiter in waiters:
+                    waiter.set_exception(exc)
+            else:
+                for waiter in waiters:
+                    waiter.set_result(result)
+
+    def stop(self):
+        self._executor.shutdown(wait=False)
+        with self._lock:
+            for channel in self._channels.values():
+                channel.session.close()
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {
+                key: {
+                    "busy": channel.busy,
+                    "pending": channel.pending if channel.has_pending else None,
+                    "sent": channel.sent,
+                    "coalesced": channel.coalesced,
+                    "failures": channel.failures,
+                }
+                for key, channel in self._channels.items()
+            }
@@ -0,0 +1,111 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, Optional
+
+HEALTH_CHECK_INTERVAL_SECONDS = 30.0
+HEALTH_CHECK_WORKERS = 8
+
+
+class DeviceHealthMonitor:
+    """Status table for all devices, refreshed by concurrent background probes.
+
+    Every status change, whether it comes from a probe or from ``set_status``
+    (e.g. after a command), is reported once through ``on_change``;
+    unchanged results are not. ``snapshot`` returns the whole table for
+    clients that just connected.
+    """
+
+    def __init__(
+        self,
+        on_change: Callable[[str, str], None],
+        interval: float = HEALTH_CHECK_INTERVAL_SECONDS,
+        max_workers: int = HEALTH_CHECK_WORKERS,
+        sleep: Callable[[float], None] = time.sleep,
+        logger=None,
+    ):
+        self._on_change = on_change
+        self._interval = interval
+        self._max_workers = max_workers
+        self._sleep = sleep
+        self._logger = logger
+        self._probes: Dict[str, Callable[[], str]] = {}
+        self._statuses: Dict[str, str] = {}
+        self._checked_at: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._rounds = 0
+        self._last_round_ms: Optional[float] = None
+
+    @property
+    def interval(self) -> float:
+        return self._interval
+
+    def add(self, key: str, probe: Callable[[], str], status: str = "unknown"):
+        with self._lock:
+            self._probes[key] = probe
+            self._statuses.setdefault(key, status)
+
+    def set_status(self, key: str, status: str) -> bool:
+        """Record a status; returns True (and notifies) only if it changed."""
+        with self._lock:
+            previous = self._statuses.get(key)
+            self._statuses[key] = status
+            self._checked_at[key] = time.time()
+        if previous == status:
+            return False
+        try:
+            self._on_change(key, status)
+        except Exception:
+            if self._logger:
+                self._logger.exception("Status change handler failed for %s", key)
+        return True
+
+    def status(self, key: str) -> Optional[str]:
+        with self._lock:
+            return self._statuses.get(key)
+
+    def snapshot(self) -> Dict[str, str]:
+        with self._lock:
+            return dict(self._statuses)
+
+    def check_all(self):
+        with self._lock:
+            probes = dict(self._probes)
+        if not probes:
+            return
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=max(1, min(self._max_workers, len(probes))),
+                thread_name_prefix="device-health",
+            )
+
+        started = time.perf_counter()
+        futures = {self._executor.submit(probe): key for key, probe in probes.items()}
+        for future in as_completed(futures):
+            key = futures[future]
+            try:
+                status = future.result()
+            except Exception:
+                if self._logger:
+                    self._logger.exception("Health probe for %s failed", key)
+                status = "error"
+            self.set_status(key, status)
+        self._rounds += 1
+        self._last_round_ms = round((time.perf_counter() - started) * 1000, 1)
+
+    def run(self, initial_delay: float = 0.0):
+        self._sleep(initial_delay)
+        while True:
+            self.check_all()
+            self._sleep(self._interval)
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                "devices": len(self._probes),
+                "interval_seconds": self._interval,
+                "rounds": self._rounds,
+                "last_round_ms": self._last_round_ms,
+                "checked_at": dict(self._checked_at),
+            }
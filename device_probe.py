@@ -0,0 +1,78 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict
+
+PROBE_CONNECT_TIMEOUT_SECONDS = 1.0
+PROBE_READ_TIMEOUT_SECONDS = 2.0
+STARTUP_PROBE_DEADLINE_SECONDS = 3.0
+STARTUP_PROBE_WORKERS = 8
+
+
+def probe_timeout():
+    """``(connect, read)`` timeout for a single device request."""
+    return (PROBE_CONNECT_TIMEOUT_SECONDS, PROBE_READ_TIMEOUT_SECONDS)
+
+
+def run_startup_probes(
+    probes: Dict[str, Callable[[], Any]],
+    deadline_seconds: float = STARTUP_PROBE_DEADLINE_SECONDS,
+    max_workers: int = STARTUP_PROBE_WORKERS,
+    logger=None,
+) -> Dict[str, Any]:
+    """Run all ``probes`` concurrently and wait at most ``deadline_seconds``.
+
+    Each probe records its own result (usually a device status). Probes
+    that miss the deadline are not cancelled: they finish in the background
+    and are logged when they do. Returns a summary with per-probe timings.
+    """
+    if not probes:
+        return {"resolved": {}, "pending": [], "elapsed_ms": 0.0}
+
+    started = time.perf_counter()
+    timings: Dict[str, float] = {}
+
+    def timed(name, probe):
+        probe_started = time.perf_counter()
+        try:
+            return probe()
+        finally:
+            timings[name] = round((time.perf_counter() - probe_started) * 1000, 1)
+
+    def log_late(name, future):
+        if logger:
+            logger.info(
+                "Startup probe %s finished after the deadline (%s ms)%s",
+                name,
+                timings.get(name),
+                f": {future.exception()}" if future.exception() else "",
+            )
+
+    executor = ThreadPoolExecutor(
+        max_workers=max(1, min(max_workers, len(probes))), thread_name_prefix="startup-probe"
+    )
+    futures = {executor.submit(timed, name, probe): name for name, probe in probes.items()}
+    done, not_done = wait(futures, timeout=deadline_seconds)
+    # Let the stragglers finish on their own; nothing waits for them.
+    executor.shutdown(wait=False)
+
+    for future in done:
+        if future.exception() and logger:
+            logger.warning("Startup probe %s failed: %s", futures[future], future.exception())
+    for future in not_done:
+        name = futures[future]
+        future.add_done_callback(lambda finished, name=name: log_late(name, finished))
+
+    summary = {
+        "resolved": {futures[future]: timings.get(futures[future]) for future in done},
+        "pending": sorted(futures[future] for future in not_done),
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+    }
+    if logger:
+        logger.info(
+            "Startup probes: %s resolved, %s pending after %s ms; timings (ms): %s",
+            len(summary["resolved"]),
+            len(summary["pending"]),
+            summary["elapsed_ms"],
+            summary["resolved"],
+        )
+    return summary
@@ -0,0 +1,84 @@
+from typing import Sequence
+
+import numpy as np
+
+# Share of the point budget that is reserved for per-bucket extremes of the
+# secondary series (humidity), so short spikes survive downsampling.
+EXTREMES_SHARE = 0.5
+# Smallest budget that leaves room for both the line shape and the extremes.
+MIN_MAX_POINTS = 10
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """Largest-Triangle-Three-Buckets: indices of ``threshold`` representative points.
+
+    ``x`` must be sorted. The first and last point are always kept. Bucket
+    boundaries and the averages of every bucket are computed up front with
+    NumPy; only the choice of one point per bucket, which depends on the
+    point chosen in the previous bucket, walks the buckets in order.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(x)
+    if threshold >= n or n <= 2:
+        return np.arange(n)
+    if threshold < 3:
+        return np.array([0, n - 1])
+
+    every = (n - 2) / (threshold - 2)
+    edges = np.floor(np.arange(threshold - 1) * every).astype(np.int64) + 1
+    counts = np.diff(edges)
+    average_x = np.append(np.add.reduceat(x[:n - 1], edges[:-1]) / counts, x[-1])
+    average_y = np.append(np.add.reduceat(y[:n - 1], edges[:-1]) / counts, y[-1])
+
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    anchor = 0
+    for bucket in range(threshold - 2):
+        lo, hi = edges[bucket], edges[bucket + 1]
+        ax, ay = x[anchor], y[anchor]
+        areas = np.abs(
+            (ax - average_x[bucket + 1]) * (y[lo:hi] - ay)
+            - (ax - x[lo:hi]) * (average_y[bucket + 1] - ay)
+        )
+        anchor = lo + int(np.argmax(areas))
+        selected[bucket + 1] = anchor
+    return selected
+
+
+def extreme_indices(y: np.ndarray, buckets: int) -> np.ndarray:
+    """Indices of the minimum and maximum of ``y`` in each of ``buckets`` equal slices."""
+    y = np.asarray(y, dtype=np.float64)
+    n = len(y)
+    if n == 0 or buckets <= 0:
+        return np.array([], dtype=np.int64)
+    buckets = min(buckets, n)
+
+    bucket_ids = np.arange(n) * buckets // n
+    order = np.lexsort((y, bucket_ids))
+    ends = np.searchsorted(bucket_ids, np.arange(buckets), side="right")
+    starts = np.concatenate(([0], ends[:-1]))
+    return np.unique(np.concatenate((order[starts], order[ends - 1])))
+
+
+def downsample_indices(
+    timestamps: Sequence[float], primary: Sequence[float], secondary: Sequence[float], max_points: int
+) -> np.ndarray:
+    """Sorted indices of at most ``max_points`` rows to plot.
+
+    Half of the budget goes to LTTB on ``primary`` (the line shape), the
+    other half to the minimum and maximum of ``secondary`` per bucket, so
+    spikes such as the humidity peaks of a shower are never dropped.
+    Budgets below ``MIN_MAX_POINTS`` raise ``ValueError``.
+    """
+    n = len(timestamps)
+    max_points = int(max_points)
+    if max_points < MIN_MAX_POINTS:
+        raise ValueError(f"max_points must be at least {MIN_MAX_POINTS}")
+    if n <= max_points:
+        return np.arange(n)
+
+    extreme_buckets = int(max_points * EXTREMES_SHARE) // 2
+    shape = lttb_indices(timestamps, primary, max_points - 2 * extreme_buckets)
+    spikes = extreme_indices(secondary, extreme_buckets)
+    return np.union1d(shape, spikes)
@@ -0,0 +1,51 @@
+import threading
+from typing import Dict, Optional, Tuple
+
+FRAME_WAIT_TIMEOUT_SECONDS = 5.0
+
+
+class FrameBus:
+    """Newest camera frame plus a sequence number, shared with all viewers.
+
+    ``publish`` replaces the frame and wakes every waiting client.
+    ``wait_for_frame`` blocks until a frame newer than ``last_seq`` exists
+    and returns only the newest one, so a slow client skips the frames it
+    missed instead of falling behind.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._frame: Optional[bytes] = None
+        self._seq = 0
+        self._waiting = 0
+
+    def publish(self, frame: bytes) -> int:
+        with self._condition:
+            self._frame = frame
+            self._seq += 1
+            self._condition.notify_all()
+            return self._seq
+
+    def latest(self) -> Tuple[int, Optional[bytes]]:
+        with self._condition:
+            return self._seq, self._frame
+
+    def wait_for_frame(
+        self, last_seq: int = 0, timeout: float = FRAME_WAIT_TIMEOUT_SECONDS
+    ) -> Tuple[int, Optional[bytes]]:
+        """Return ``(seq, frame)`` for the newest frame after ``last_seq``.
+
+        Returns ``(last_seq, None)`` if nothing new arrives within ``timeout``.
+        """
+        with self._condition:
+            self._waiting += 1
+            try:
+                if not self._condition.wait_for(lambda: self._seq > last_seq, timeout):
+                    return last_seq, None
+                return self._seq, self._frame
+            finally:
+                self._waiting -= 1
+
+    def stats(self) -> Dict[str, int]:
+        with self._condition:
+            return {"seq": self._seq, "waiting_clients": self._waiting}
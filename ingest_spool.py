@@ -0,0 +1,257 @@
+import json
+import os
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+SPOOL_FILENAME = "ingest.jsonl"
+OFFSET_FILENAME = "ingest.offset"
+DEAD_LETTER_FILENAME = "ingest.dead.jsonl"
+DRAIN_BATCH_READINGS = 500
+DRAIN_POLL_SECONDS = 0.5
+DRAIN_MAX_BACKOFF_SECONDS = 30.0
+# Errors that mean the spooled data itself is bad; retrying cannot help.
+INVALID_BATCH_ERRORS = (ValueError, KeyError, TypeError)
+
+
+class IngestSpool:
+    """Append-only spool file between the HTTP endpoint and the database.
+
+    ``append`` writes one JSON line per request and returns; a background
+    drainer feeds complete lines to ``handler`` as ``[(batch_id, readings)]``
+    and then advances a persisted byte offset. Lines that were accepted but
+    not yet committed survive a restart. Delivery is at-least-once: a crash
+    between the database commit and the offset update replays those lines,
+    so the handler records each ``batch_id`` with its readings and skips
+    the ones it already has.
+
+    Lines that cannot be decoded, and lines the handler rejects with one
+    of ``invalid_errors`` on their own, are moved to a dead-letter file so
+    one bad line cannot block everything spooled after it. Any other
+    error (a locked or unavailable database) keeps the offset in place and
+    is retried with exponential backoff; nothing is dead-lettered for it.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        handler: Callable[[List[Tuple[Optional[str], List[Dict[str, Any]]]]], None],
+        batch_readings: int = DRAIN_BATCH_READINGS,
+        poll_seconds: float = DRAIN_POLL_SECONDS,
+        fsync: bool = False,
+        invalid_errors: Tuple[type, ...] = INVALID_BATCH_ERRORS,
+        logger=None,
+    ):
+        os.makedirs(directory, exist_ok=True)
+        self._path = os.path.join(directory, SPOOL_FILENAME)
+        self._offset_path = os.path.join(directory, OFFSET_FILENAME)
+        self._dead_letter_path = os.path.join(directory, DEAD_LETTER_FILENAME)
+        self._handler = handler
+        self._batch_readings = max(int(batch_readings), 1)
+        self._poll_seconds = poll_seconds
+        self._fsync = fsync
+        self._invalid_errors = invalid_errors
+        self._logger = logger
+        self._append_lock = threading.Lock()
+        self._drain_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._offset = self._load_offset()
+        # Consecutive transient failures, and the end of a batch with bad data.
+        self._failures = 0
+        self._isolate_until = 0
+        self._stats = {
+            "appended": 0,
+            "drained": 0,
+            "skipped_lines": 0,
+            "failed_drains": 0,
+            "dead_lettered_lines": 0,
+            "last_drain_ms": None,
+            "last_drain_readings": 0,
+            "last_error": None,
+        }
+
+    def _load_offset(self) -> int:
+        try:
+            with open(self._offset_path, "r") as offset_file:
+                offset = int(offset_file.read().strip() or 0)
+        except (OSError, ValueError):
+            return 0
+        size = os.path.getsize(self._path) if os.path.exists(self._path) else 0
+        return offset if 0 <= offset <= size else 0
+
+    def _store_offset(self, offset: int):
+        temp_path = self._offset_path + ".tmp"
+        with open(temp_path, "w") as offset_file:
+            offset_file.write(str(offset))
+            offset_file.flush()
+            if self._fsync:
+                os.fsync(offset_file.fileno())
+        os.replace(temp_path, self._offset_path)
+        self._offset = offset
+
+    def append(self, readings: List[Dict[str, Any]]):
+        line = json.dumps({
+            "batch_id": uuid.uuid4().hex,
+            "queued_at": time.time(),
+            "readings": readings,
+        }) + "\n"
+        with self._append_lock:
+            with open(self._path, "a") as spool_file:
+                spool_file.write(line)
+                spool_file.flush()
+                if self._fsync:
+                    os.fsync(spool_file.fileno())
+            self._stats["appended"] += len(readings)
+        self._wakeup.set()
+
+    def _read_pending(self, max_lines: Optional[int] = None):
+        """Return ``(batches, end_offset, unreadable)`` for the next complete lines.
+
+        An unreadable line is returned on its own, with ``unreadable`` set.
+        """
+        batches: List[Tuple[Optional[str], List[Dict[str, Any]]]] = []
+        count = 0
+        end_offset = self._offset
+        if not os.path.exists(self._path):
+            return batches, end_offset, False
+
+        lines = 0
+        with open(self._path, "rb") as spool_file:
+            spool_file.seek(self._offset)
+            while count < self._batch_readings and (max_lines is None or lines < max_lines):
+                line = spool_file.readline()
+                if not line or not line.endswith(b"\n"):
+                    break
+                try:
+                    entry = json.loads(line)
+                    readings = list(entry["readings"])
+                except (ValueError, KeyError, TypeError):
+                    if batches:
+                        break
+                    return batches, end_offset + len(line), True
+                end_offset += len(line)
+                lines += 1
+                # Lines spooled before batch ids existed replay without dedup.
+                batches.append((entry.get("batch_id"), readings))
+                count += len(readings)
+        return batches, end_offset, False
+
+    def drain(self) -> int:
+        """Hand everything that is spooled to the handler. Runs in an app context."""
+        drained = 0
+        with self._drain_lock:
+            while True:
+                # After a batch with bad data, go line by line until past it.
+                isolated = self._offset < self._isolate_until
+                batches, end_offset, unreadable = self._read_pending(1 if isolated else None)
+                if end_offset == self._offset:
+                    break
+
+                started = time.perf_counter()
+                readings = sum(len(batch_readings) for _, batch_readings in batches)
+                if unreadable:
+                    self._stats["skipped_lines"] += 1
+                    if self._logger:
+                        self._logger.error(
+                            "Moving unreadable ingest spool line at %s to %s",
+                            self._offset,
+                            self._dead_letter_path,
+                        )
+                    self._dead_letter(end_offset)
+                elif batches:
+                    try:
+                        self._handler(batches)
+                    except self._invalid_errors as exc:
+                        self._stats["failed_drains"] += 1
+                        self._stats["last_error"] = str(exc)
+                        if not isolated:
+                            # Find the line at fault; the others are stored as usual.
+                            self._isolate_until = end_offset
+                            continue
+                        if self._logger:
+                            self._logger.exception(
+                                "Ingest spool line at %s is invalid, moving it to %s",
+                                self._offset,
+                                self._dead_letter_path,
+                            )
+                        self._dead_letter(end_offset)
+                        readings = 0
+                    except Exception as exc:
+                        self._failures += 1
+                        self._stats["failed_drains"] += 1
+                        self._stats["last_error"] = str(exc)
+                        if self._logger:
+                            self._logger.exception(
+                                "Ingest spool drain failed, retrying in %s s", self.retry_delay()
+                            )
+                        break
+                self._failures = 0
+                self._store_offset(end_offset)
+                drained += readings
+                self._stats["drained"] += readings
+                self._stats["last_drain_readings"] = readings
+                self._stats["last_drain_ms"] = round((time.perf_counter() - started) * 1000, 3)
+                self._stats["last_error"] = None
+
+            self._truncate_if_drained()
+        return drained
+
+    def _dead_letter(self, end_offset: int):
+        with open(self._path, "rb") as spool_file:
+            spool_file.seek(self._offset)
+            lines = spool_file.read(end_offset - self._offset)
+        with open(self._dead_letter_path, "ab") as dead_letter_file:
+            dead_letter_file.write(lines)
+            dead_letter_file.flush()
+            if self._fsync:
+                os.fsync(dead_letter_file.fileno())
+        self._stats["dead_lettered_lines"] += lines.count(b"\n")
+
+    def _truncate_if_drained(self):
+        with self._append_lock:
+            if not os.path.exists(self._path) or self._offset == 0:
+                return
+            if os.path.getsize(self._path) == self._offset:
+                with open(self._path, "w"):
+                    pass
+                self._store_offset(0)
+                self._isolate_until = 0
+
+    def retry_delay(self) -> float:
+        """Seconds until the next drain; grows while the handler keeps failing."""
+        if not self._failures:
+            return self._poll_seconds
+        return min(self._poll_seconds * 2 ** min(self._failures, 16), DRAIN_MAX_BACKOFF_SECONDS)
+
+    def run(self, app):
+        with app.app_context():
+            while True:
+                self._wakeup.clear()
+                self.drain()
+                if self._failures:
+                    # New uploads must not cut the backoff short.
+                    time.sleep(self.retry_delay())
+                else:
+                    self._wakeup.wait(self._poll_seconds)
+
+    def _oldest_pending_age(self) -> Optional[float]:
+        if not os.path.exists(self._path):
+            return None
+        with open(self._path, "rb") as spool_file:
+            spool_file.seek(self._offset)
+            line = spool_file.readline()
+        if not line.endswith(b"\n"):
+            return None
+        try:
+            return round(time.time() - json.loads(line)["queued_at"], 3)
+        except (ValueError, KeyError, TypeError):
+            return None
+
+    def stats(self) -> Dict[str, Any]:
+        size = os.path.getsize(self._path) if os.path.exists(self._path) else 0
+        stats = dict(self._stats)
+        stats["pending_bytes"] = max(size - self._offset, 0)
+        stats["lag_seconds"] = self._oldest_pending_age()
+        stats["consecutive_failures"] = self._failures
+        return stats
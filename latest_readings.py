@@ -0,0 +1,131 @@
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterable, Optional
+
+from sqlalchemy import and_, func, select
+
+from models import TemperatureData
+
+PERSIST_INTERVAL_SECONDS = 30
+
+
+class LatestReadingCache:
+    """Newest temperature reading per device, kept current by the ingest path.
+
+    Readings are only replaced by newer ones, so late or replayed batches
+    never move a device backwards. With ``path`` set, the table is written
+    to a JSON file at most every ``persist_interval`` seconds and loaded from
+    it on start, which spares the startup scan of ``temperature_data``.
+    """
+
+    def __init__(self, path: Optional[str] = None, persist_interval: float = PERSIST_INTERVAL_SECONDS, logger=None):
+        self._path = path
+        self._persist_interval = persist_interval
+        self._logger = logger
+        self._lock = threading.Lock()
+        self._readings: Dict[str, Dict[str, Any]] = {}
+        self._dirty = False
+        self._last_persist = 0.0
+
+    def update(self, readings: Iterable[Dict[str, Any]]):
+        with self._lock:
+            for reading in readings:
+                current = self._readings.get(reading["device_id"])
+                if current is not None and current["timestamp"] >= reading["timestamp"]:
+                    continue
+                self._readings[reading["device_id"]] = {
+                    "temperature": reading["temperature"],
+                    "humidity": reading["humidity"],
+                    "timestamp": reading["timestamp"],
+                }
+                self._dirty = True
+        if self._path and time.monotonic() - self._last_persist >= self._persist_interval:
+            self.persist()
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {device_id: dict(reading) for device_id, reading in self._readings.items()}
+
+    def seed_from_database(self, db):
+        """One grouped query over the (device_id, timestamp) index, at startup only."""
+        latest = (
+            select(TemperatureData.device_id, func.max(TemperatureData.timestamp).label("latest"))
+            .group_by(TemperatureData.device_id)
+            .subquery()
+        )
+        rows = db.session.execute(
+            select(
+                TemperatureData.device_id,
+                TemperatureData.temperature,
+                TemperatureData.humidity,
+                TemperatureData.timestamp,
+            ).join(
+                latest,
+                and_(
+                    TemperatureData.device_id == latest.c.device_id,
+                    TemperatureData.timestamp == latest.c.latest,
+                ),
+            )
+        )
+        self.update(
+            {"device_id": device_id, "temperature": temperature, "humidity": humidity, "timestamp": timestamp}
+            for device_id, temperature, humidity, timestamp in rows
+            if device_id
+        )
+
+    def load(self) -> bool:
+        if not self._path or not os.path.exists(self._path):
+            return False
+        try:
+            with open(self._path, "r") as persisted:
+                stored = json.load(persisted)
+            self.update(
+                {**reading, "device_id": device_id, "timestamp": datetime.fromisoformat(reading["timestamp"])}
+                for device_id, reading in stored.items()
+            )
+        except (OSError, ValueError, KeyError, TypeError):
+            if self._logger:
+                self._logger.warning("Ignoring unreadable latest-readings file %s", self._path)
+            return False
+        return True
+
+    def persist(self):
+        if not self._path:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            payload = {
+                device_id: {**reading, "timestamp": reading["timestamp"].isoformat()}
+                for device_id, reading in self._readings.items()
+            }
+            self._dirty = False
+            self._last_persist = time.monotonic()
+        temp_path = self._path + ".tmp"
+        try:
+            with open(temp_path, "w") as persisted:
+                json.dump(payload, persisted)
+            os.replace(temp_path, self._path)
+        except OSError:
+            with self._lock:
+                self._dirty = True
+            if self._logger:
+                self._logger.warning("Could not persist latest readings to %s", self._path, exc_info=True)
+
+
+def get_latest_readings(app, db) -> LatestReadingCache:
+    """Return the app-wide latest-reading cache, seeding it on first use."""
+    cache = app.extensions.get("latest_readings")
+    if cache is None:
+        cache = LatestReadingCache(
+            app.config.get("LATEST_READINGS_PATH"),
+            persist_interval=app.config.get("LATEST_READINGS_PERSIST_SECONDS", PERSIST_INTERVAL_SECONDS),
+            logger=app.logger,
+        )
+        if not cache.load():
+            cache.seed_from_database(db)
+        app.extensions["latest_readings"] = cache
+    return cache
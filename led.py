@@ -1,13 +1,22 @@
-from datetime import datetime
+import atexit
+import time
+from concurrent.futures import Future, wait
+from functools import partial
 from pathlib import Path
 from typing import Dict, List
 
 import requests
 import yaml
-from flask import Blueprint, jsonify, render_template, request
-from flask_socketio import SocketIO
-from requests.exceptions import ConnectionError, RequestException
-from sqlalchemy import and_, func
+from flask import Blueprint, current_app, jsonify, render_template, request
+from flask_socketio import SocketIO, emit
+from requests.exceptions import RequestException
+
+from command_dispatcher import COMMAND_WORKERS, CommandDispatcher
+from device_health import HEALTH_CHECK_INTERVAL_SECONDS, DeviceHealthMonitor
+from device_probe import probe_timeout, run_startup_probes
+from latest_readings import get_latest_readings
+from scenes import LED_COMMANDS, SCENE_DEADLINE_SECONDS, SOCKET_COMMANDS, resolve_targets
+from weather import get_weather_cache
 
 
 def _safe_load_config(config_path: Path) -> Dict:
@@ -23,15 +32,6 @@ def create_led_blueprint(socketio: SocketIO, db):
     CONFIG_PATH = Path("config.yaml")
     config = _safe_load_config(CONFIG_PATH)
 
-    class TemperatureData(db.Model):
-        __tablename__ = "temperature_data"
-
-        id = db.Column(db.Integer, primary_key=True)
-        device_id = db.Column(db.String(50))
-        temperature = db.Column(db.Float, nullable=False)
-        humidity = db.Column(db.Float, nullable=False)
-        timestamp = db.Column(db.DateTime, default=datetime.utcnow)
-
     def init_devices(section: str) -> Dict[str, Dict]:
         devices = {}
         for device_id, info in config.get(section, {}).items():
@@ -46,13 +46,19 @@ def create_led_blueprint(socketio: SocketIO, db):
 
     esp_devices = init_devices('devices')
     socket_devices = init_devices('socket_devices')
+    health_config = config.get('health_monitor') or {}
+    scenes = config.get('scenes') or {}
+
+    @led_blueprint.record_once
+    def start_weather_cache(state):
+        get_weather_cache(state.app, socketio, config.get('weather'))
 
 
     @led_blueprint.route('/')
     def index():
         latest_readings = fetch_latest_readings()
         grouped_devices = group_devices_by_room(latest_readings)
-        weather = fetch_weather()
+        weather = get_weather_cache(current_app, socketio, config.get('weather')).reports()
 
         return render_template(
             'index.html',
@@ -62,80 +68,222 @@ def create_led_blueprint(socketio: SocketIO, db):
         )
 
 
+    @led_blueprint.route('/get_weather_stats')
+    def get_weather_stats():
+        return jsonify(get_weather_cache(current_app, socketio, config.get('weather')).stats())
+
+    def apply_status_change(key, status):
+        kind, device_id = key.split(':', 1)
+        if kind == 'esp':
+            esp_devices[device_id]['status'] = status
+            emit_led_status(device_id)
+        else:
+            socket_devices[device_id]['status'] = status
+            emit_socket_status(device_id)
+
+    def get_health_monitor(app) -> DeviceHealthMonitor:
+        monitor = app.extensions.get('device_health')
+        if monitor is None:
+            monitor = DeviceHealthMonitor(
+                apply_status_change,
+                interval=float(health_config.get('interval_seconds', HEALTH_CHECK_INTERVAL_SECONDS)),
+                sleep=socketio.sleep,
+                logger=app.logger,
+            )
+            for device_id in esp_devices:
+                monitor.add(f"esp:{device_id}", partial(check_esp, device_id))
+            for device_id in socket_devices:
+                monitor.add(f"socket:{device_id}", partial(read_socket_status, device_id, probe_timeout()))
+            app.extensions['device_health'] = monitor
+        return monitor
+
+    def get_command_dispatcher(app) -> CommandDispatcher:
+        dispatcher = app.extensions.get('device_commands')
+        if dispatcher is None:
+            dispatcher = CommandDispatcher(
+                partial(run_command, app._get_current_object()),
+                # Enough workers for a scene to reach every device at once.
+                max_workers=max(COMMAND_WORKERS, len(esp_devices) + len(socket_devices)),
+                logger=app.logger,
+            )
+            app.extensions['device_commands'] = dispatcher
+            atexit.register(dispatcher.stop)
+        return dispatcher
+
+    def run_command(app, session, key, command):
+        """Runs on the dispatcher thread, after the HTTP request has been answered."""
+        kind, device_id = key.split(':', 1)
+        if kind == 'esp':
+            status = send_command_to_device(session, device_id, command)
+        else:
+            status = send_socket_command(session, device_id, command)
+            # Confirm the real switch state unless another command is already queued.
+            if status == 'sent' and get_command_dispatcher(app).has_pending(key):
+                return status
+            if status == 'sent':
+                status = read_socket_status(device_id, session=session)
+        get_health_monitor(app).set_status(key, status)
+        return status
+
     @led_blueprint.route('/control_led/<device_id>', methods=['POST'])
     def control_led(device_id):
         command = request.form.get('command')
         if device_id not in esp_devices:
             return jsonify({"error": "Unknown device"}), 404
+        if command not in LED_COMMANDS:
+            return jsonify({"error": "Unknown command"}), 400
 
-        send_command_to_device(device_id, command)
-        emit_led_status(device_id)
-        return '', 204
+        coalesced = get_command_dispatcher(current_app).submit(f"esp:{device_id}", command)
+        return jsonify({"queued": True, "coalesced": coalesced}), 202
 
     @led_blueprint.route('/control_socket/<device_id>', methods=['POST'])
     def control_socket(device_id):
         command = request.form.get('command')
         if device_id not in socket_devices:
             return jsonify({"error": "Unknown socket"}), 404
+        if command not in SOCKET_COMMANDS:
+            return jsonify({"error": "Unknown command"}), 400
+
+        coalesced = get_command_dispatcher(current_app).submit(f"socket:{device_id}", command)
+        return jsonify({"queued": True, "coalesced": coalesced}), 202
+
+    def fan_out(targets, errors, deadline):
+        """Send all commands concurrently and collect what finished by the deadline."""
+        started = time.perf_counter()
+        dispatcher = get_command_dispatcher(current_app)
+        futures = {}
+        for key, command in targets.items():
+            waiter = Future()
+            dispatcher.submit(key, command, waiter)
+            futures[waiter] = (key, command)
+
+        done, _ = wait(futures, timeout=deadline)
+        results = list(errors)
+        for waiter, (key, command) in futures.items():
+            result = {'target': key, 'command': command}
+            if waiter not in done:
+                # Still running; the health monitor reports the outcome later.
+                result['status'] = 'pending'
+            elif waiter.exception() is not None:
+                result['status'] = 'error'
+                result['error'] = str(waiter.exception())
+            else:
+                result['status'] = waiter.result() or 'unchanged'
+            results.append(result)
 
-        send_socket_command(device_id, command)
-        update_socket_status(device_id)
-        emit_socket_status(device_id)
-        return '', 204
+        ok = not errors and all(
+            result.get('status') not in ('error', 'not connected', 'pending') for result in results
+        )
+        return {
+            'ok': ok,
+            'elapsed_ms': round((time.perf_counter() - started) * 1000, 1),
+            'results': results,
+        }
 
-    def send_command_to_device(device_id, command):
+    @led_blueprint.route('/scene/<name>', methods=['POST'])
+    def run_scene(name):
+        scene = scenes.get(name)
+        if not scene:
+            return jsonify({"error": "Unknown scene"}), 404
+
+        targets, errors = resolve_targets(scene, esp_devices, socket_devices)
+        outcome = fan_out(
+            targets, errors, float(scene.get('deadline_seconds', SCENE_DEADLINE_SECONDS))
+        )
+        return jsonify({'scene': name, **outcome}), 200 if outcome['ok'] else 207
+
+    @led_blueprint.route('/room/<room>', methods=['POST'])
+    def control_room(room):
+        command = request.form.get('command') or (request.get_json(silent=True) or {}).get('command')
+        if command not in SOCKET_COMMANDS:
+            return jsonify({"error": "Unknown command"}), 400
+
+        targets, errors = resolve_targets({'rooms': {room: command}}, esp_devices, socket_devices)
+        if not targets:
+            return jsonify({"error": "Unknown room"}), 404
+        outcome = fan_out(targets, errors, SCENE_DEADLINE_SECONDS)
+        return jsonify({'room': room, **outcome}), 200 if outcome['ok'] else 207
+
+    @led_blueprint.route('/get_scenes')
+    def get_scenes():
+        return jsonify(sorted(scenes))
+
+    @led_blueprint.route('/get_device_health')
+    def get_device_health():
+        monitor = get_health_monitor(current_app)
+        return jsonify({**monitor.stats(), 'statuses': monitor.snapshot()})
+
+    @led_blueprint.route('/get_command_stats')
+    def get_command_stats():
+        return jsonify(get_command_dispatcher(current_app).stats())
+
+    def send_command_to_device(session, device_id, command):
         try:
-            response = requests.get(f"http://{esp_devices[device_id]['ip']}/{command}", timeout=2)
+            response = session.get(f"http://{esp_devices[device_id]['ip']}/{command}", timeout=probe_timeout())
             if response.status_code == 200:
-                esp_devices[device_id]['status'] = command
-            else:
-                esp_devices[device_id]['status'] = 'error'
-        except ConnectionError:
-            esp_devices[device_id]['status'] = 'not connected'
-
-    def send_socket_command(device_id, command):
+                # The ESPs cannot report their LED state, so remember the last command.
+                esp_devices[device_id]['led_state'] = command
+                return command
+            return 'error'
+        except RequestException:
+            return 'not connected'
+
+    def send_socket_command(session, device_id, command):
+        """Send a switch command; returns 'sent' or the failure status."""
         try:
             if command == 'toggle':
-                response = requests.post(
+                response = session.post(
                     f"http://{socket_devices[device_id]['ip']}/rpc/Switch.Toggle",
                     json={"id": 0},
-                    timeout=2
+                    timeout=probe_timeout()
                 )
             else:
-                response = requests.post(
+                response = session.post(
                     f"http://{socket_devices[device_id]['ip']}/rpc/Switch.Set",
                     json={"id": 0, "on": command == 'on'},
-                    timeout=2
+                    timeout=probe_timeout()
                 )
+            return 'sent' if response.status_code == 200 else 'error'
+        except RequestException:
+            return 'not connected'
 
-            if response.status_code != 200:
-                socket_devices[device_id]['status'] = 'error'
-
-        except ConnectionError:
-            socket_devices[device_id]['status'] = 'not connected'
-
-
-    def update_socket_status(device_id):
+    def read_socket_status(device_id, timeout=2, session=requests):
         try:
-            response = requests.get(
+            response = session.get(
                 f"http://{socket_devices[device_id]['ip']}/rpc/Switch.GetStatus",
                 params={"id": 0},
-                timeout=2
+                timeout=timeout
             )
-            if response.status_code == 200:
-                data = response.json()
-                socket_devices[device_id]['status'] = 'on' if data.get('output') else 'off'
-            else:
-                socket_devices[device_id]['status'] = 'unknown'
-        except ConnectionError:
-            socket_devices[device_id]['status'] = 'not connected'
+            if response.status_code != 200:
+                return 'unknown'
+            data = response.json()
+        except RequestException:
+            return 'not connected'
+        except ValueError:
+            return 'error'
+        if not isinstance(data, dict):
+            return 'error'
+        return 'on' if data.get('output') else 'off'
+
+    def check_esp(device_id):
+        try:
+            response = requests.get(f"http://{esp_devices[device_id]['ip']}/", timeout=probe_timeout())
+        except RequestException:
+            return 'not connected'
+        if response.status_code != 200:
+            return 'error'
+        return esp_devices[device_id].get('led_state') or 'unknown'
 
     @socketio.on('connect')
     def on_connect():
-        for device_id in esp_devices:
-            emit_led_status(device_id)
-        for device_id in socket_devices:
-            emit_socket_status(device_id)
+        # Only the new client needs the full table; everyone else already has it.
+        statuses = get_health_monitor(current_app).snapshot()
+        emit('device_status_snapshot', {
+            'led': {key.split(':', 1)[1]: status for key, status in statuses.items() if key.startswith('esp:')},
+            'socket': {
+                key.split(':', 1)[1]: status for key, status in statuses.items() if key.startswith('socket:')
+            },
+        })
 
     def emit_led_status(device_id):
         socketio.emit('led_status', {'device_id': device_id, 'status': esp_devices[device_id]['status']})
@@ -143,47 +291,32 @@ def create_led_blueprint(socketio: SocketIO, db):
     def emit_socket_status(device_id):
         socketio.emit('socket_status', {'device_id': device_id, 'status': socket_devices[device_id]['status']})
 
-    for device_id in esp_devices:
+    def probe_esp(monitor, device_id):
+        # Switch the LEDs off at startup; answering also proves the ESP is reachable.
         try:
-            requests.get(f"http://{esp_devices[device_id]['ip']}/off")
-            esp_devices[device_id]['status'] = 'off'
-        except:
-            esp_devices[device_id]['status'] = 'not connected'
-
-    for device_id in socket_devices:
-        update_socket_status(device_id)
-        emit_socket_status(device_id)
-
-    def fetch_latest_readings():
-        subquery = (
-            db.session.query(
-                TemperatureData.device_id,
-                func.max(TemperatureData.timestamp).label("latest_timestamp"),
-            )
-            .group_by(TemperatureData.device_id)
-            .subquery()
-        )
-
-        latest_entries = (
-            db.session.query(TemperatureData)
-            .join(
-                subquery,
-                and_(
-                    TemperatureData.device_id == subquery.c.device_id,
-                    TemperatureData.timestamp == subquery.c.latest_timestamp,
-                ),
-            )
-            .all()
+            requests.get(f"http://{esp_devices[device_id]['ip']}/off", timeout=probe_timeout())
+            esp_devices[device_id]['led_state'] = 'off'
+            monitor.set_status(f"esp:{device_id}", 'off')
+        except RequestException:
+            monitor.set_status(f"esp:{device_id}", 'not connected')
+
+    def probe_socket(monitor, device_id):
+        monitor.set_status(f"socket:{device_id}", read_socket_status(device_id, probe_timeout()))
+
+    @led_blueprint.record_once
+    def probe_devices_at_startup(state):
+        monitor = get_health_monitor(state.app)
+        probes = {f"esp:{device_id}": partial(probe_esp, monitor, device_id) for device_id in esp_devices}
+        probes.update(
+            {f"socket:{device_id}": partial(probe_socket, monitor, device_id) for device_id in socket_devices}
         )
+        run_startup_probes(probes, logger=state.app.logger)
+        # The startup probes just ran, so the first scheduled round waits one interval.
+        socketio.start_background_task(monitor.run, monitor.interval)
 
-        return {
-            entry.device_id: {
-                "temperature": entry.temperature,
-                "humidity": entry.humidity,
-                "timestamp": entry.timestamp,
-            }
-            for entry in latest_entries
-        }
+    def fetch_latest_readings():
+        # Maintained by the temperature ingest path; costs O(devices) per page view.
+        return get_latest_readings(current_app, db).snapshot()
 
     def group_devices_by_room(latest_readings):
         rooms: Dict[str, List[Dict]] = {}
@@ -229,88 +362,4 @@ def create_led_blueprint(socketio: SocketIO, db):
             return "connected" if status in {"on", "off"} else "unknown"
         return "unknown"
 
-    def fetch_weather():
-        locations = {
-            "Saarburg": {"latitude": 49.6097, "longitude": 6.5438},
-            "Schengen": {"latitude": 49.4683, "longitude": 6.3667},
-            "Saarbrücken": {"latitude": 49.2402, "longitude": 6.9969},
-        }
-
-        def weather_summary(code):
-            if code is None:
-                return {"symbol": "—", "label": "Keine Daten"}
-            if code == 0:
-                return {"symbol": "☀️", "label": "Klar"}
-            if code in {1, 2}:
-                return {"symbol": "🌤️", "label": "Leicht bewölkt"}
-            if code == 3:
-                return {"symbol": "☁️", "label": "Bewölkt"}
-            if code in {45, 48}:
-                return {"symbol": "🌫️", "label": "Nebel"}
-            if 51 <= code <= 57:
-                return {"symbol": "🌦️", "label": "Nieselregen"}
-            if 61 <= code <= 67:
-                return {"symbol": "🌧️", "label": "Regen"}
-            if 71 <= code <= 77:
-                return {"symbol": "🌨️", "label": "Schnee"}
-            if 80 <= code <= 82:
-                return {"symbol": "🌦️", "label": "Schauer"}
-            if 85 <= code <= 86:
-                return {"symbol": "🌨️", "label": "Schneeschauer"}
-            if code in {95, 96, 99}:
-                return {"symbol": "⛈️", "label": "Gewitter"}
-            return {"symbol": "—", "label": "Unbekannt"}
-
-        weather_reports = []
-        for name, coords in locations.items():
-            try:
-                response = requests.get(
-                    "https://api.open-meteo.com/v1/forecast",
-                    params={
-                        "latitude": coords["latitude"],
-                        "longitude": coords["longitude"],
-                        "current": "temperature_2m,relative_humidity_2m,weather_code",
-                        "daily": "temperature_2m_max,temperature_2m_min,precipitation_probability_max,weather_code",
-                        "forecast_days": 1,
-                        "timezone": "Europe/Berlin",
-                    },
-                    timeout=5,
-                )
-                response.raise_for_status()
-                payload = response.json()
-                current = payload.get("current", {})
-                daily = payload.get("daily", {})
-
-                summary = weather_summary(current.get("weather_code"))
-                weather_reports.append(
-                    {
-                        "location": name,
-                        "temperature": current.get("temperature_2m"),
-                        "humidity": current.get("relative_humidity_2m"),
-                        "weather_code": current.get("weather_code"),
-                        "symbol": summary["symbol"],
-                        "condition": summary["label"],
-                        "forecast_max": (daily.get("temperature_2m_max") or [None])[0],
-                        "forecast_min": (daily.get("temperature_2m_min") or [None])[0],
-                        "precipitation_probability": (daily.get("precipitation_probability_max") or [None])[0],
-                    }
-                )
-            except (RequestException, ValueError, KeyError):
-                weather_reports.append(
-                    {
-                        "location": name,
-                        "temperature": None,
-                        "humidity": None,
-                        "weather_code": None,
-                        "symbol": "—",
-                        "condition": "Keine Daten",
-                        "forecast_max": None,
-                        "forecast_min": None,
-                        "precipitation_probability": None,
-                        "error": "Wetterdaten konnten nicht geladen werden",
-                    }
-                )
-
-        return weather_reports
-
     return led_blueprint
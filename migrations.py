@@ -0,0 +1,171 @@
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Tuple
+
+import click
+
+# Versioned schema changes for existing databases. ``db.create_all`` only
+# creates missing tables (with their indexes), so anything that changes an
+# existing table is added here with the next version number. The applied
+# version is kept in SQLite's ``PRAGMA user_version``.
+
+
+def _create_time_series_indexes(connection):
+    for statement in (
+        "CREATE INDEX IF NOT EXISTS ix_temperature_data_device_timestamp "
+        "ON temperature_data (device_id, timestamp)",
+        "CREATE INDEX IF NOT EXISTS ix_temperature_data_timestamp ON temperature_data (timestamp)",
+        "CREATE INDEX IF NOT EXISTS ix_power_data_device_timestamp ON power_data (device_id, timestamp)",
+        "CREATE INDEX IF NOT EXISTS ix_power_data_timestamp ON power_data (timestamp)",
+        "CREATE INDEX IF NOT EXISTS ix_shower_events_device_start ON shower_events (device_id, start_time)",
+        "CREATE INDEX IF NOT EXISTS ix_shower_events_start_time ON shower_events (start_time)",
+        "CREATE INDEX IF NOT EXISTS ix_calendar_events_start_time ON calendar_events (start_time)",
+    ):
+        connection.exec_driver_sql(statement)
+    # Give the query planner statistics for the new indexes.
+    connection.exec_driver_sql("ANALYZE")
+
+
+def _backfill_temperature_daily(connection):
+    # Daily rows are maintained on ingest from here on; fold in the history once.
+    connection.exec_driver_sql(
+        "INSERT INTO temperature_daily (device_id, day, sample_count, "
+        "temperature_min, temperature_max, temperature_sum, humidity_min, humidity_max, humidity_sum) "
+        "SELECT device_id, date(timestamp), COUNT(*), MIN(temperature), MAX(temperature), "
+        "SUM(temperature), MIN(humidity), MAX(humidity), SUM(humidity) "
+        "FROM temperature_data WHERE device_id IS NOT NULL AND timestamp IS NOT NULL "
+        "GROUP BY device_id, date(timestamp) "
+        "ON CONFLICT (device_id, day) DO NOTHING"
+    )
+
+
+MIGRATIONS: List[Tuple[int, str, Callable[[Any], None]]] = [
+    (1, "Composite (device_id, timestamp) and event time indexes", _create_time_series_indexes),
+    (2, "Backfill daily temperature aggregates", _backfill_temperature_daily),
+]
+
+# Hot queries and the index each of them must use. Parameters are
+# placeholders; only the plan matters.
+_NOW = datetime(2000, 1, 2)
+HOT_QUERIES: List[Tuple[str, str, Dict[str, Any], str]] = [
+    (
+        "temperature day chart",
+        "SELECT timestamp, temperature, humidity FROM temperature_data "
+        "WHERE device_id = :device_id AND timestamp BETWEEN :start AND :end ORDER BY timestamp",
+        {"device_id": "ESP_01", "start": _NOW - timedelta(days=1), "end": _NOW},
+        "ix_temperature_data_device_timestamp",
+    ),
+    (
+        "temperature series range",
+        "SELECT timestamp, temperature, humidity FROM temperature_data "
+        "WHERE device_id = :device_id AND timestamp >= :start AND timestamp < :end "
+        "ORDER BY timestamp",
+        {"device_id": "ESP_01", "start": _NOW - timedelta(days=1), "end": _NOW},
+        "ix_temperature_data_device_timestamp",
+    ),
+    (
+        "latest temperature per device",
+        "SELECT device_id, MAX(timestamp) FROM temperature_data GROUP BY device_id",
+        {},
+        "ix_temperature_data_device_timestamp",
+    ),
+    (
+        "power raw window",
+        "SELECT timestamp, power FROM power_data "
+        "WHERE device_id = :device_id AND timestamp BETWEEN :start AND :end ORDER BY timestamp",
+        {"device_id": "socket-0", "start": _NOW - timedelta(hours=1), "end": _NOW},
+        "ix_power_data_device_timestamp",
+    ),
+    (
+        "power carried-in sample",
+        "SELECT timestamp, power FROM power_data "
+        "WHERE device_id = :device_id AND timestamp < :start ORDER BY timestamp DESC LIMIT 1",
+        {"device_id": "socket-0", "start": _NOW},
+        "ix_power_data_device_timestamp",
+    ),
+    (
+        "power rollup window",
+        "SELECT bucket_start, power_sum FROM power_rollups "
+        "WHERE device_id = :device_id AND resolution = :resolution "
+        "AND bucket_start BETWEEN :start AND :end ORDER BY bucket_start",
+        {"device_id": "socket-0", "resolution": 60, "start": _NOW - timedelta(days=1), "end": _NOW},
+        # The unique constraint is backed by an automatic index.
+        "sqlite_autoindex_power_rollups",
+    ),
+    (
+        "temperature daily stats",
+        "SELECT day, temperature_min, temperature_max FROM temperature_daily "
+        "WHERE device_id = :device_id AND day >= :start AND day < :end ORDER BY day",
+        {"device_id": "ESP_01", "start": _NOW.date() - timedelta(days=365), "end": _NOW.date()},
+        "sqlite_autoindex_temperature_daily",
+    ),
+    (
+        "open shower event",
+        "SELECT id FROM shower_events WHERE device_id = :device_id AND end_time IS NULL "
+        "ORDER BY start_time DESC LIMIT 1",
+        {"device_id": "ESP_01"},
+        "ix_shower_events_device_start",
+    ),
+    (
+        "calendar events",
+        "SELECT id FROM calendar_events ORDER BY start_time",
+        {},
+        "ix_calendar_events_start_time",
+    ),
+]
+
+
+def schema_version(connection) -> int:
+    return connection.exec_driver_sql("PRAGMA user_version").scalar() or 0
+
+
+def upgrade_database(db, logger=None) -> int:
+    """Create missing tables and apply pending migrations. Returns the schema version."""
+    db.create_all()
+    with db.engine.begin() as connection:
+        version = schema_version(connection)
+        for target, description, migrate in MIGRATIONS:
+            if target <= version:
+                continue
+            if logger:
+                logger.info("Applying schema migration %s: %s", target, description)
+            migrate(connection)
+            # PRAGMA does not take bound parameters; target is an int from MIGRATIONS.
+            connection.exec_driver_sql(f"PRAGMA user_version = {int(target)}")
+            version = target
+    return version
+
+
+def check_query_plans(db) -> List[Dict[str, Any]]:
+    """Run ``EXPLAIN QUERY PLAN`` for every hot query and report the index it uses."""
+    results = []
+    with db.engine.connect() as connection:
+        for name, sql, params, expected_index in HOT_QUERIES:
+            plan = [
+                row[-1]
+                for row in connection.execute(db.text(f"EXPLAIN QUERY PLAN {sql}"), params)
+            ]
+            results.append({
+                "query": name,
+                "expected_index": expected_index,
+                "uses_index": any(expected_index in step for step in plan),
+                "plan": plan,
+            })
+    return results
+
+
+def register_migration_commands(app, db):
+    @app.cli.command("db-upgrade")
+    def db_upgrade():
+        """Apply pending schema migrations to the configured database."""
+        version = upgrade_database(db, app.logger)
+        click.echo(f"Schema version {version}")
+
+    @app.cli.command("db-check-indexes")
+    def db_check_indexes():
+        """Verify that the hot time-series queries are served by indexes."""
+        results = check_query_plans(db)
+        for result in results:
+            status = "ok" if result["uses_index"] else "FULL SCAN"
+            click.echo(f"[{status}] {result['query']}: {' / '.join(result['plan'])}")
+        if not all(result["uses_index"] for result in results):
+            raise SystemExit(1)
@@ -1,21 +1,118 @@
-from datetime import datetime
+from datetime import datetime, timezone
 
 from extensions import db
 
 
+class TemperatureData(db.Model):
+    __tablename__ = 'temperature_data'
+    __table_args__ = (
+        db.Index('ix_temperature_data_device_timestamp', 'device_id', 'timestamp'),
+        {'extend_existing': True},
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    device_id = db.Column(db.String(50))
+    temperature = db.Column(db.Float, nullable=False)
+    humidity = db.Column(db.Float, nullable=False)
+    timestamp = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+
+class TemperatureDaily(db.Model):
+    __tablename__ = 'temperature_daily'
+    __table_args__ = (
+        db.UniqueConstraint('device_id', 'day', name='uq_temperature_daily_day'),
+        {'extend_existing': True},
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    device_id = db.Column(db.String(50), nullable=False)
+    day = db.Column(db.Date, nullable=False)
+    sample_count = db.Column(db.Integer, nullable=False, default=0)
+    temperature_min = db.Column(db.Float)
+    temperature_max = db.Column(db.Float)
+    temperature_sum = db.Column(db.Float)
+    humidity_min = db.Column(db.Float)
+    humidity_max = db.Column(db.Float)
+    humidity_sum = db.Column(db.Float)
+
+
+class IngestBatch(db.Model):
+    """Spooled batches that are already stored, so a replayed spool line is skipped."""
+    __tablename__ = 'ingest_batches'
+    __table_args__ = {'extend_existing': True}
+
+    id = db.Column(db.Integer, primary_key=True)
+    batch_id = db.Column(db.String(32), nullable=False, unique=True)
+    committed_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+
+class PowerData(db.Model):
+    __tablename__ = 'power_data'
+    __table_args__ = (
+        db.Index('ix_power_data_device_timestamp', 'device_id', 'timestamp'),
+        {'extend_existing': True},
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    device_id = db.Column(db.String(64))
+    voltage = db.Column(db.Float)
+    current = db.Column(db.Float)
+    power = db.Column(db.Float)
+    energy = db.Column(db.Float)
+    timestamp = db.Column(
+        db.DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), index=True
+    )
+
+
+class PowerRollup(db.Model):
+    __tablename__ = 'power_rollups'
+    __table_args__ = (
+        db.UniqueConstraint(
+            'device_id', 'resolution', 'bucket_start', name='uq_power_rollups_bucket'
+        ),
+        {'extend_existing': True},
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    device_id = db.Column(db.String(64), nullable=False)
+    resolution = db.Column(db.Integer, nullable=False)
+    bucket_start = db.Column(db.DateTime(timezone=True), nullable=False)
+    sample_count = db.Column(db.Integer, nullable=False, default=0)
+    power_min = db.Column(db.Float)
+    power_max = db.Column(db.Float)
+    power_sum = db.Column(db.Float)
+    power_last = db.Column(db.Float)
+    voltage_min = db.Column(db.Float)
+    voltage_max = db.Column(db.Float)
+    voltage_sum = db.Column(db.Float)
+    voltage_last = db.Column(db.Float)
+    current_min = db.Column(db.Float)
+    current_max = db.Column(db.Float)
+    current_sum = db.Column(db.Float)
+    current_last = db.Column(db.Float)
+    energy_last = db.Column(db.Float)
+    last_timestamp = db.Column(db.DateTime(timezone=True))
+
+
 class ShowerEvent(db.Model):
     __tablename__ = 'shower_events'
-    __table_args__ = {'extend_existing': True}
+    __table_args__ = (
+        db.Index('ix_shower_events_device_start', 'device_id', 'start_time'),
+        {'extend_existing': True},
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     device_id = db.Column(db.String(50), nullable=False)
-    start_time = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    start_time = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
     end_time = db.Column(db.DateTime, nullable=True)
 
 
 class CalendarEvent(db.Model):
     __tablename__ = 'calendar_events'
-    __table_args__ = {'extend_existing': True}
+    __table_args__ = (
+        db.Index('ix_calendar_events_start_time', 'start_time'),
+        {'extend_existing': True},
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(120), nullable=False)
@@ -1,10 +1,29 @@
+import atexit
 import os
 from datetime import datetime, timedelta, timezone
 from typing import Any, Dict, List, Optional
 
-import requests
+import numpy as np
 import yaml
 from flask import Blueprint, current_app, jsonify, render_template, request
+from sqlalchemy import select
+
+from models import PowerData, PowerRollup
+from power_compression import DeadbandCompressor
+from power_energy import ENERGY_BUCKETS, EnergyBucketCache, consumption_per_bucket
+from power_poller import PowerPoller
+from power_rollups import (
+    DEFAULT_MIN_CHART_POINTS,
+    ROLLUP_FIELDS,
+    ROLLUP_RESOLUTIONS,
+    aggregate_samples,
+    choose_resolution,
+    upsert_statement,
+)
+from retention import get_retention_engine
+from stream_hub import get_stream_hub
+from timeseries_export import CHUNK_ROWS, EXPORT_FORMATS, export_response
+from write_buffer import WriteBehindBuffer
 
 DEFAULT_DEVICE = {
     "id": "socket-0",
@@ -13,23 +32,59 @@ DEFAULT_DEVICE = {
 }
 POLL_INTERVAL_SECONDS = 0.2
 REQUEST_TIMEOUT_SECONDS = 5
+POLLER_WORKERS = 4
+WRITE_BATCH_SIZE = 200
+WRITE_FLUSH_INTERVAL_SECONDS = 1.0
+WRITE_QUEUE_SIZE = 10000
+ROLLUP_1M_RETENTION_DAYS = 90
+RAW_EXPORT_COLUMNS = ("voltage", "current", "power", "energy")
+ROLLUP_EXPORT_COLUMNS = ("power", "power_min", "power_max", "voltage", "current", "energy")
 
 
 def create_power_blueprint(socketio, db):
     power_blueprint = Blueprint("power", __name__)
-
-    class PowerData(db.Model):
-        __tablename__ = "power_data"
-
-        id = db.Column(db.Integer, primary_key=True)
-        device_id = db.Column(db.String(64))
-        voltage = db.Column(db.Float)
-        current = db.Column(db.Float)
-        power = db.Column(db.Float)
-        energy = db.Column(db.Float)
-        timestamp = db.Column(
-            db.DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), index=True
-        )
+    stream_hub = get_stream_hub(socketio)
+
+    rollup_upsert = upsert_statement(PowerRollup.__table__)
+    energy_cache = EnergyBucketCache()
+
+    def _write_power_rows(rows: List[Dict[str, Any]]):
+        raw_rows = [
+            {key: value for key, value in row.items() if key != "persist"}
+            for row in rows
+            if row["persist"]
+        ]
+        if raw_rows:
+            db.session.execute(PowerData.__table__.insert(), raw_rows)
+        # Rollups are folded from the batch in hand and merged into the stored
+        # buckets, so they stay current without rescanning raw samples.
+        db.session.execute(rollup_upsert, aggregate_samples(rows))
+
+    def _get_write_buffer(app) -> WriteBehindBuffer:
+        write_buffer = app.extensions.get("power_write_buffer")
+        if write_buffer is None:
+            write_buffer = WriteBehindBuffer(
+                db,
+                _write_power_rows,
+                batch_size=app.config.get("POWER_WRITE_BATCH_SIZE", WRITE_BATCH_SIZE),
+                flush_interval=app.config.get(
+                    "POWER_WRITE_FLUSH_INTERVAL", WRITE_FLUSH_INTERVAL_SECONDS
+                ),
+                max_queue_size=app.config.get("POWER_WRITE_QUEUE_SIZE", WRITE_QUEUE_SIZE),
+                logger=app.logger,
+            )
+            app.extensions["power_write_buffer"] = write_buffer
+        return write_buffer
+
+    def _get_compressor(app) -> DeadbandCompressor:
+        compressor = app.extensions.get("power_compressor")
+        if compressor is None:
+            compressor = DeadbandCompressor(app.config.get("POWER_COMPRESSION"))
+            for device in _get_configured_devices(app):
+                if "compression" in device:
+                    compressor.configure(device.get("id") or device.get("url"), device["compression"])
+            app.extensions["power_compressor"] = compressor
+        return compressor
 
     def _load_devices_from_config_file() -> Optional[List[Dict[str, str]]]:
         config_path = os.path.join(os.path.dirname(__file__), "config.yaml")
@@ -54,8 +109,11 @@ def create_power_blueprint(socketio, db):
                     "id": device_id,
                     "name": (props or {}).get("name") or device_id,
                     "url": f"http://{ip}/rpc/Switch.GetStatus?id=0",
+                    "poll_interval": (props or {}).get("poll_interval"),
                 }
             )
+            if "compression" in (props or {}):
+                devices[-1]["compression"] = props["compression"]
 
         return devices or None
 
@@ -85,94 +143,103 @@ def create_power_blueprint(socketio, db):
         first_device = devices[0]
         return first_device.get("id") or first_device.get("url")
 
+    def _first_present(payload: Dict[str, Any], *keys: str) -> Optional[float]:
+        # A plug idling at 0.0 W is a valid reading, so don't fall through on falsy values.
+        for key in keys:
+            if payload.get(key) is not None:
+                return payload[key]
+        return None
+
     def _parse_power_value(payload: Dict[str, Any]) -> Optional[float]:
-        return payload.get("apower") or payload.get("power")
+        return _first_present(payload, "apower", "power")
 
     def _parse_energy_value(payload: Dict[str, Any]) -> Optional[float]:
-        energy_payload = payload.get("aenergy") or {}
-        return energy_payload.get("total") or energy_payload.get("total_wh")
-
-    def _collect_device_data(app, device_config: Dict[str, str]):
-        device_url = device_config.get("url") or DEFAULT_DEVICE["url"]
-        device_id = device_config.get("id") or device_url
-        poll_interval = app.config.get("POWER_POLL_INTERVAL", POLL_INTERVAL_SECONDS)
-
-        with app.app_context():
-            while True:
-                try:
-                    response = requests.get(device_url, timeout=REQUEST_TIMEOUT_SECONDS)
-                    response.raise_for_status()
-                    payload = response.json() or {}
-
-                    sample = PowerData(
-                        device_id=device_id,
-                        voltage=payload.get("voltage"),
-                        current=payload.get("current"),
-                        power=_parse_power_value(payload),
-                        energy=_parse_energy_value(payload),
-                    )
-                    db.session.add(sample)
-                    db.session.commit()
-
-                    socketio.emit(
-                        "power_sample",
-                        {
-                            "device_id": sample.device_id,
-                            "voltage": sample.voltage,
-                            "current": sample.current,
-                            "power": sample.power,
-                            "energy": sample.energy,
-                            "timestamp": (sample.timestamp or datetime.utcnow())
-                            .replace(tzinfo=timezone.utc)
-                            .isoformat(),
-                        },
-                    )
-                except Exception:
-                    db.session.rollback()
-                    app.logger.exception("Failed to collect power data from %s", device_url)
-
-                socketio.sleep(poll_interval)
-
-    def _cleanup_old_data(app):
+        return _first_present(payload.get("aenergy") or {}, "total", "total_wh")
+
+    def _handle_sample(app, device_config: Dict[str, Any], payload: Dict[str, Any]):
+        device_id = device_config.get("id") or device_config.get("url")
+        sample = {
+            "device_id": device_id,
+            "voltage": payload.get("voltage"),
+            "current": payload.get("current"),
+            "power": _parse_power_value(payload),
+            "energy": _parse_energy_value(payload),
+            "timestamp": datetime.now(timezone.utc),
+        }
+        # Rollups are built from every sample; only raw rows are compressed.
+        compressor = _get_compressor(app)
+        persist = compressor.should_store(sample)
+        if not _get_write_buffer(app).put({**sample, "persist": persist}):
+            app.logger.warning("Power write buffer full, dropped sample from %s", device_id)
+        elif persist:
+            # Only a queued sample may move the deadband; a dropped one was never stored.
+            compressor.mark_stored(sample)
+
+        stream_hub.publish(
+            "power",
+            device_id,
+            "power_sample",
+            {**sample, "timestamp": sample["timestamp"].isoformat()},
+        )
+
+    def _get_poller(app) -> PowerPoller:
+        poller = app.extensions.get("power_poller")
+        if poller is None:
+            poller = PowerPoller(
+                _get_configured_devices(app),
+                on_sample=lambda device, payload: _handle_sample(app, device, payload),
+                power_of=_parse_power_value,
+                default_interval=app.config.get("POWER_POLL_INTERVAL", POLL_INTERVAL_SECONDS),
+                request_timeout=REQUEST_TIMEOUT_SECONDS,
+                max_workers=app.config.get("POWER_POLLER_WORKERS", POLLER_WORKERS),
+                adaptive=app.config.get("POWER_ADAPTIVE_POLLING"),
+                logger=app.logger,
+            )
+            app.extensions["power_poller"] = poller
+        return poller
+
+    def _register_retention(app):
         retention_days = app.config.get("POWER_RETENTION_DAYS", 7) or 7
-        cleanup_interval_seconds = max(retention_days, 1) * 24 * 60 * 60
-
-        with app.app_context():
-            while True:
-                try:
-                    cutoff = datetime.now(timezone.utc) - timedelta(days=retention_days)
-                    deleted = PowerData.query.filter(PowerData.timestamp < cutoff).delete()
-                    db.session.commit()
-                    app.logger.info(
-                        "Power cleanup removed %s rows older than %s days",
-                        deleted,
-                        retention_days,
-                    )
-                except Exception:
-                    db.session.rollback()
-                    app.logger.exception("Power cleanup failed")
-
-                socketio.sleep(cleanup_interval_seconds)
+        engine = get_retention_engine(app, db, socketio)
+        engine.register("power_data", PowerData.__table__, PowerData.timestamp, retention_days)
+        engine.register(
+            "power_rollups_1s",
+            PowerRollup.__table__,
+            PowerRollup.bucket_start,
+            retention_days,
+            where=PowerRollup.resolution == ROLLUP_RESOLUTIONS["1s"],
+        )
+        engine.register(
+            "power_rollups_1m",
+            PowerRollup.__table__,
+            PowerRollup.bucket_start,
+            app.config.get("POWER_ROLLUP_1M_RETENTION_DAYS", ROLLUP_1M_RETENTION_DAYS),
+            where=PowerRollup.resolution == ROLLUP_RESOLUTIONS["1m"],
+        )
 
     @power_blueprint.record_once
     def start_collectors(state):
         app = state.app
         device_flags = app.extensions.setdefault("power_collectors", {})
-        devices = _get_configured_devices(app)
-
-        for device in devices:
-            device_key = device.get("id") or device.get("url")
-            started_key = f"started::{device_key}"
-            if device_flags.get(started_key):
-                continue
 
-            device_flags[started_key] = True
-            socketio.start_background_task(_collect_device_data, app, device)
-
-        cleanup_key = "started::power_cleanup"
-        if not device_flags.get(cleanup_key):
-            device_flags[cleanup_key] = True
-            socketio.start_background_task(_cleanup_old_data, app)
+        writer_key = "started::power_writer"
+        if not device_flags.get(writer_key):
+            device_flags[writer_key] = True
+            write_buffer = _get_write_buffer(app)
+            socketio.start_background_task(write_buffer.run, app)
+            atexit.register(write_buffer.close, app)
+
+        poller_key = "started::power_poller"
+        if not device_flags.get(poller_key):
+            device_flags[poller_key] = True
+            poller = _get_poller(app)
+            socketio.start_background_task(poller.run)
+            atexit.register(poller.stop)
+
+        retention_key = "started::power_retention"
+        if not device_flags.get(retention_key):
+            device_flags[retention_key] = True
+            _register_retention(app)
 
     @power_blueprint.route("/power")
     def power_dashboard():
@@ -187,6 +254,50 @@ def create_power_blueprint(socketio, db):
         end_time = datetime.utcnow()
         start_time = end_time - timedelta(seconds=max(duration_seconds or 0, 0))
 
+        try:
+            resolution = choose_resolution(
+                request.args.get("resolution"),
+                max(duration_seconds or 0, 0),
+                current_app.config.get("POWER_CHART_MIN_POINTS", DEFAULT_MIN_CHART_POINTS),
+            )
+        except ValueError as exc:
+            return jsonify({"error": str(exc)}), 400
+
+        export_format = request.args.get("format", "json")
+        if export_format not in EXPORT_FORMATS:
+            return jsonify({"error": f"Unknown format: {export_format}"}), 400
+
+        if resolution is not None:
+            if export_format != "json":
+                return export_response(
+                    export_format,
+                    _iter_rollup_rows(resolved_device_id, resolution, start_time, end_time),
+                    ROLLUP_EXPORT_COLUMNS,
+                    {"device_id": resolved_device_id, "resolution": resolution},
+                )
+            return jsonify(
+                _query_rollups(resolved_device_id, resolution, start_time, end_time)
+            )
+
+        # Stored rows are sample-and-hold, so the value in force at the start of
+        # the window is the last row written before it.
+        carried_in = (
+            PowerData.query.filter(
+                PowerData.timestamp < start_time,
+                PowerData.device_id == resolved_device_id,
+            )
+            .order_by(PowerData.timestamp.desc())
+            .first()
+        )
+
+        if export_format != "json":
+            return export_response(
+                export_format,
+                _iter_raw_rows(resolved_device_id, start_time, end_time, carried_in),
+                RAW_EXPORT_COLUMNS,
+                {"device_id": resolved_device_id},
+            )
+
         query = (
             PowerData.query.filter(
                 PowerData.timestamp.between(start_time, end_time),
@@ -196,6 +307,18 @@ def create_power_blueprint(socketio, db):
         )
 
         data = []
+        if carried_in is not None:
+            data.append(
+                {
+                    "device_id": carried_in.device_id,
+                    "voltage": carried_in.voltage,
+                    "current": carried_in.current,
+                    "power": carried_in.power,
+                    "energy": carried_in.energy,
+                    "timestamp": start_time.replace(tzinfo=timezone.utc).isoformat(),
+                }
+            )
+
         for row in query:
             timestamp = row.timestamp or datetime.utcnow()
             aware_ts = timestamp.replace(tzinfo=timezone.utc)
@@ -212,6 +335,201 @@ def create_power_blueprint(socketio, db):
 
         return jsonify(data)
 
+    def _iter_raw_rows(device_id: str, start_time, end_time, carried_in):
+        if carried_in is not None:
+            yield (
+                start_time,
+                carried_in.voltage,
+                carried_in.current,
+                carried_in.power,
+                carried_in.energy,
+            )
+
+        rows = db.session.execute(
+            select(
+                PowerData.timestamp,
+                PowerData.voltage,
+                PowerData.current,
+                PowerData.power,
+                PowerData.energy,
+            )
+            .where(
+                PowerData.timestamp.between(start_time, end_time),
+                PowerData.device_id == device_id,
+            )
+            .order_by(PowerData.timestamp.asc())
+            .execution_options(yield_per=CHUNK_ROWS)
+        )
+        for row in rows:
+            yield tuple(row)
+
+    def _iter_rollup_rows(device_id: str, resolution: int, start_time, end_time):
+        rows = db.session.execute(
+            select(
+                PowerRollup.bucket_start,
+                PowerRollup.power_sum / PowerRollup.sample_count,
+                PowerRollup.power_min,
+                PowerRollup.power_max,
+                PowerRollup.voltage_sum / PowerRollup.sample_count,
+                PowerRollup.current_sum / PowerRollup.sample_count,
+                PowerRollup.energy_last,
+            )
+            .where(
+                PowerRollup.device_id == device_id,
+                PowerRollup.resolution == resolution,
+                PowerRollup.bucket_start.between(start_time, end_time),
+            )
+            .order_by(PowerRollup.bucket_start.asc())
+            .execution_options(yield_per=CHUNK_ROWS)
+        )
+        for row in rows:
+            yield tuple(row)
+
+    def _query_rollups(device_id: str, resolution: int, start_time, end_time) -> List[Dict[str, Any]]:
+        query = (
+            PowerRollup.query.filter(
+                PowerRollup.device_id == device_id,
+                PowerRollup.resolution == resolution,
+                PowerRollup.bucket_start.between(start_time, end_time),
+            )
+            .order_by(PowerRollup.bucket_start.asc())
+        )
+
+        data = []
+        for row in query:
+            item = {
+                "device_id": row.device_id,
+                "resolution": row.resolution,
+                "samples": row.sample_count,
+                "energy": row.energy_last,
+                "timestamp": row.bucket_start.replace(tzinfo=timezone.utc).isoformat(),
+            }
+            for field in ROLLUP_FIELDS:
+                total = getattr(row, f"{field}_sum")
+                item[field] = total / row.sample_count if row.sample_count and total is not None else None
+                item[f"{field}_min"] = getattr(row, f"{field}_min")
+                item[f"{field}_max"] = getattr(row, f"{field}_max")
+                item[f"{field}_last"] = getattr(row, f"{field}_last")
+            data.append(item)
+        return data
+
+    def _parse_time_arg(name: str) -> Optional[datetime]:
+        value = request.args.get(name)
+        if not value:
+            return None
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        if parsed.tzinfo is not None:
+            parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+        return parsed
+
+    def _hourly_counters(device_id: str, start_hour: np.datetime64, end_hour: np.datetime64):
+        counter_filter = (
+            PowerRollup.device_id == device_id,
+            PowerRollup.resolution == ROLLUP_RESOLUTIONS["1h"],
+            PowerRollup.energy_last.isnot(None),
+        )
+        start_time = start_hour.astype(datetime)
+        previous = db.session.execute(
+            select(PowerRollup.bucket_start, PowerRollup.energy_last)
+            .where(*counter_filter, PowerRollup.bucket_start < start_time)
+            .order_by(PowerRollup.bucket_start.desc())
+            .limit(1)
+        ).all()
+        rows = db.session.execute(
+            select(PowerRollup.bucket_start, PowerRollup.energy_last)
+            .where(
+                *counter_filter,
+                PowerRollup.bucket_start >= start_time,
+                PowerRollup.bucket_start < end_hour.astype(datetime),
+            )
+            .order_by(PowerRollup.bucket_start.asc())
+        ).all()
+        # The first reading after the range closes any gap that straddles its end.
+        following = db.session.execute(
+            select(PowerRollup.bucket_start, PowerRollup.energy_last)
+            .where(*counter_filter, PowerRollup.bucket_start >= end_hour.astype(datetime))
+            .order_by(PowerRollup.bucket_start.asc())
+            .limit(1)
+        ).all()
+        readings = previous + rows + following
+        hours = np.array([row[0] for row in readings], dtype="datetime64[h]")
+        counters = np.array([row[1] for row in readings], dtype=np.float64)
+        return hours, counters
+
+    @power_blueprint.route("/power/energy")
+    def get_energy():
+        bucket = request.args.get("bucket", "day")
+        if bucket not in ENERGY_BUCKETS:
+            return jsonify({"error": f"Unknown bucket: {bucket}"}), 400
+        device_id = _resolve_device_id(current_app, request.args.get("device_id"))
+        unit = ENERGY_BUCKETS[bucket]
+
+        try:
+            start = _parse_time_arg("start")
+            end = _parse_time_arg("end")
+        except ValueError:
+            return jsonify({"error": "Invalid start or end"}), 400
+
+        now = datetime.utcnow()
+        if start is None:
+            default_unit = {"hour": "D", "day": "M", "month": "Y"}[bucket]
+            start = np.datetime64(now, default_unit).astype(datetime)
+        current_hour = np.datetime64(now, "h")
+        start_key = np.datetime64(start, unit)
+        end_key = np.datetime64(end, unit) if end else np.datetime64(now, unit) + 1
+        bucket_keys = np.arange(start_key, end_key, dtype=f"datetime64[{unit}]")
+
+        results = {}
+        first_missing = None
+        for key in bucket_keys:
+            cached = energy_cache.get(device_id, bucket, key)
+            if cached is None:
+                first_missing = key
+                break
+            results[key] = cached
+
+        if first_missing is not None:
+            hours, counters = _hourly_counters(
+                device_id, first_missing.astype("datetime64[h]"), end_key.astype("datetime64[h]")
+            )
+            bucket_starts, totals, estimated = consumption_per_bucket(hours, counters, bucket)
+            last_reading_end = hours[-1] + 1 if len(hours) else None
+            for key, total, is_estimated in zip(bucket_starts, totals, estimated):
+                if key < first_missing or key >= end_key:
+                    continue
+                value = (float(total), bool(is_estimated))
+                results[key] = value
+                bucket_end = (key + 1).astype("datetime64[h]")
+                # Only buckets that are over and fully covered by readings are final.
+                if bucket_end <= current_hour and bucket_end <= last_reading_end:
+                    energy_cache.put(device_id, bucket, key, value)
+
+        buckets = []
+        for key in sorted(results):
+            energy_wh, is_estimated = results[key]
+            bucket_end = (key + 1).astype("datetime64[h]")
+            buckets.append(
+                {
+                    "start": key.astype("datetime64[s]")
+                    .astype(datetime)
+                    .replace(tzinfo=timezone.utc)
+                    .isoformat(),
+                    "energy_wh": round(energy_wh, 3),
+                    "energy_kwh": round(energy_wh / 1000, 6),
+                    "estimated": is_estimated,
+                    "complete": bool(bucket_end <= current_hour),
+                }
+            )
+
+        return jsonify(
+            {
+                "device_id": device_id,
+                "bucket": bucket,
+                "buckets": buckets,
+                "total_kwh": round(sum(item["energy_wh"] for item in buckets) / 1000, 6),
+            }
+        )
+
     @power_blueprint.route("/get_power_devices")
     def get_power_devices():
         devices = _get_configured_devices(current_app)
@@ -226,4 +544,15 @@ def create_power_blueprint(socketio, db):
             ]
         )
 
+    @power_blueprint.route("/get_power_stats")
+    def get_power_stats():
+        return jsonify(
+            {
+                "write_buffer": _get_write_buffer(current_app).stats(),
+                "poller": _get_poller(current_app).stats(),
+                "compression": _get_compressor(current_app).stats(),
+                "subscriptions": stream_hub.stats(),
+            }
+        )
+
     return power_blueprint
@@ -0,0 +1,75 @@
+import threading
+from typing import Any, Dict, Optional
+
+DEFAULT_COMPRESSION = {
+    "deadband_abs": 0.5,
+    "deadband_rel": 0.0,
+    "max_silence_seconds": 60,
+}
+
+
+class DeadbandCompressor:
+    """Decides which power samples are worth storing.
+
+    A sample is kept when its power leaves the deadband around the last
+    stored value (``deadband_abs`` watts or ``deadband_rel`` of that value,
+    whichever is larger), or when nothing has been stored for
+    ``max_silence_seconds``. Readers treat the stored series as
+    sample-and-hold: each value is valid until the next stored row.
+    """
+
+    def __init__(self, defaults: Optional[Dict[str, Any]] = None):
+        self._defaults = {**DEFAULT_COMPRESSION, **(defaults or {})}
+        self._settings: Dict[str, Optional[Dict[str, Any]]] = {}
+        self._last_stored: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._seen = 0
+        self._stored = 0
+
+    def configure(self, device_id: str, settings: Any):
+        """Apply the ``compression`` block of a device; ``False`` disables it."""
+        if settings is False:
+            self._settings[device_id] = None
+        else:
+            self._settings[device_id] = {**self._defaults, **(settings or {})}
+
+    def _settings_for(self, device_id: str) -> Optional[Dict[str, Any]]:
+        if device_id not in self._settings:
+            self._settings[device_id] = dict(self._defaults)
+        return self._settings[device_id]
+
+    def should_store(self, sample: Dict[str, Any]) -> bool:
+        """Whether ``sample`` is worth storing. Call ``mark_stored`` once it is queued."""
+        device_id = sample["device_id"]
+        with self._lock:
+            self._seen += 1
+            settings = self._settings_for(device_id)
+            last = self._last_stored.get(device_id)
+            return settings is None or last is None or self._is_significant(settings, last, sample)
+
+    def mark_stored(self, sample: Dict[str, Any]):
+        """Make ``sample`` the reference for the deadband and the heartbeat."""
+        with self._lock:
+            self._last_stored[sample["device_id"]] = sample
+            self._stored += 1
+
+    @staticmethod
+    def _is_significant(settings: Dict[str, Any], last: Dict[str, Any], sample: Dict[str, Any]) -> bool:
+        elapsed = (sample["timestamp"] - last["timestamp"]).total_seconds()
+        if elapsed >= settings["max_silence_seconds"]:
+            return True
+
+        previous, current = last.get("power"), sample.get("power")
+        if previous is None or current is None:
+            return previous is not current
+
+        threshold = max(settings["deadband_abs"], abs(previous) * settings["deadband_rel"])
+        return abs(current - previous) > threshold
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "seen": self._seen,
+                "stored": self._stored,
+                "ratio": round(self._seen / self._stored, 2) if self._stored else None,
+            }
@@ -0,0 +1,77 @@
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+ENERGY_BUCKETS = {"hour": "h", "day": "D", "month": "M"}
+CACHE_SIZE = 50000
+
+
+def hourly_consumption(hours: np.ndarray, counters: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Turn hourly counter readings into consumption per hour.
+
+    ``hours`` are the sorted hour buckets (``datetime64[h]``) and ``counters``
+    the cumulative Wh value at the end of each of them. Consumption between
+    two readings is the counter delta; a negative delta means the plug reset
+    its counter, so everything it has counted since is the consumption.
+    When readings are more than an hour apart the delta is spread evenly over
+    the hours of the gap and those hours are flagged as estimated.
+    """
+    hours = np.asarray(hours, dtype="datetime64[h]")
+    counters = np.asarray(counters, dtype=np.float64)
+    if len(hours) < 2:
+        empty = np.array([], dtype="datetime64[h]")
+        return empty, np.array([], dtype=np.float64), np.array([], dtype=bool)
+
+    deltas = np.diff(counters)
+    deltas = np.where(deltas < 0, counters[1:], deltas)
+    spans = (hours[1:] - hours[:-1]).astype(np.int64)
+
+    starts = np.repeat(hours[:-1] + np.timedelta64(1, "h"), spans)
+    group_offsets = np.repeat(np.cumsum(spans) - spans, spans)
+    offsets = np.arange(spans.sum()) - group_offsets
+    covered_hours = starts + offsets.astype("timedelta64[h]")
+    per_hour = np.repeat(deltas / spans, spans)
+    estimated = np.repeat(spans > 1, spans)
+    return covered_hours, per_hour, estimated
+
+
+def consumption_per_bucket(
+    hours: np.ndarray, counters: np.ndarray, bucket: str
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Sum hourly consumption into hour, day or month buckets (UTC)."""
+    covered_hours, per_hour, estimated = hourly_consumption(hours, counters)
+    keys = covered_hours.astype(f"datetime64[{ENERGY_BUCKETS[bucket]}]")
+    bucket_starts, inverse = np.unique(keys, return_inverse=True)
+    totals = np.bincount(inverse, weights=per_hour, minlength=len(bucket_starts))
+    any_estimated = np.bincount(inverse, weights=estimated, minlength=len(bucket_starts)) > 0
+    return bucket_starts, totals, any_estimated
+
+
+class EnergyBucketCache:
+    """Remembers consumption of buckets that can no longer change."""
+
+    def __init__(self, max_entries: int = CACHE_SIZE):
+        self._entries: "OrderedDict[Tuple[str, str, np.datetime64], Tuple[float, bool]]" = OrderedDict()
+        self._max_entries = max_entries
+        self._lock = threading.Lock()
+
+    def get(self, device_id: str, bucket: str, start: np.datetime64) -> Optional[Tuple[float, bool]]:
+        key = (device_id, bucket, start)
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def put(self, device_id: str, bucket: str, start: np.datetime64, value: Tuple[float, bool]):
+        with self._lock:
+            self._entries[(device_id, bucket, start)] = value
+            self._entries.move_to_end((device_id, bucket, start))
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._entries)}
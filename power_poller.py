@@ -0,0 +1,218 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+CONNECT_TIMEOUT_SECONDS = 1.0
+# The backoff cap is reached long before this; it only keeps 2 ** n finite.
+MAX_BACKOFF_EXPONENT = 32
+DEFAULT_ADAPTIVE = {
+    # Unreachable plugs back off exponentially up to this many seconds.
+    "max_backoff_seconds": 300.0,
+    # Plugs whose power stays inside the stable band are slowed down
+    # step by step, up to this interval.
+    "max_stable_interval": 5.0,
+    "stable_after_polls": 10,
+    "stable_slowdown_factor": 1.5,
+    "stable_band_abs": 1.0,
+    "stable_band_rel": 0.05,
+}
+
+
+class _PolledDevice:
+    def __init__(self, device: Dict[str, Any], interval: float):
+        self.device = device
+        self.device_id = device.get("id") or device.get("url")
+        self.url = device.get("url")
+        self.base_interval = interval
+        self.interval = interval
+        self.next_due = 0.0
+        self.started = 0.0
+        self.in_flight = False
+        self.polls = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.stable_polls = 0
+        self.last_power: Optional[float] = None
+        self.last_latency_ms: Optional[float] = None
+
+        # One pooled keep-alive connection per plug; Shelly firmware only
+        # serves a handful of sockets, so never open more than one.
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=1, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    @property
+    def state(self) -> str:
+        if self.consecutive_failures:
+            return "backoff"
+        if self.interval > self.base_interval:
+            return "stable"
+        return "active"
+
+
+class PowerPoller:
+    """Polls every configured plug from one scheduler loop.
+
+    Each device keeps its own schedule and keep-alive session. Due requests
+    are handed to a small, fixed worker pool, so adding plugs adds sockets
+    but no threads. The effective interval of each device adapts: it backs
+    off exponentially while the plug is unreachable, stretches while the
+    power reading is stable and drops back to the configured rate as soon as
+    the reading moves.
+    """
+
+    def __init__(
+        self,
+        devices: List[Dict[str, Any]],
+        on_sample: Callable[[Dict[str, Any], Dict[str, Any]], None],
+        power_of: Callable[[Dict[str, Any]], Optional[float]],
+        default_interval: float,
+        request_timeout: float,
+        max_workers: int = 4,
+        adaptive: Optional[Dict[str, Any]] = None,
+        logger=None,
+    ):
+        self._devices = {}
+        for device in devices:
+            interval = float(device.get("poll_interval") or default_interval)
+            state = _PolledDevice(device, interval)
+            self._devices[state.device_id] = state
+
+        self._on_sample = on_sample
+        self._power_of = power_of
+        self._timeout = (min(CONNECT_TIMEOUT_SECONDS, request_timeout), request_timeout)
+        self._adaptive = {**DEFAULT_ADAPTIVE, **(adaptive or {})}
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(1, min(int(max_workers), len(self._devices) or 1)),
+            thread_name_prefix="power-poller",
+        )
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._logger = logger
+
+    def run(self):
+        while not self._stopped.is_set():
+            self._wakeup.clear()
+            now = time.monotonic()
+            next_wakeup = now + 1.0
+
+            with self._lock:
+                for state in self._devices.values():
+                    if state.in_flight:
+                        continue
+                    if state.next_due <= now:
+                        state.in_flight = True
+                        state.started = now
+                        self._executor.submit(self._poll, state)
+                    else:
+                        next_wakeup = min(next_wakeup, state.next_due)
+
+            self._wakeup.wait(max(next_wakeup - time.monotonic(), 0.0))
+
+    def _poll(self, state: _PolledDevice):
+        error: Optional[Exception] = None
+        payload: Dict[str, Any] = {}
+        try:
+            response = state.session.get(state.url, timeout=self._timeout)
+            response.raise_for_status()
+            payload = response.json() or {}
+        except Exception as exc:
+            error = exc
+
+        finished = time.monotonic()
+        if error is None:
+            try:
+                self._on_sample(state.device, payload)
+            except Exception:
+                if self._logger:
+                    self._logger.exception("Power sample handler failed for %s", state.device_id)
+
+        with self._lock:
+            try:
+                state.polls += 1
+                state.last_latency_ms = round((finished - state.started) * 1000, 3)
+                if error is None:
+                    self._on_success(state, payload)
+                else:
+                    self._on_failure(state, error)
+            finally:
+                # Fixed-rate schedule: the next poll is due one interval after this
+                # one started, but never in the past if the device was slow. A
+                # device must never stay in flight, or it is not polled again.
+                state.next_due = max(state.started + state.interval, time.monotonic())
+                state.in_flight = False
+                self._wakeup.set()
+
+    def _on_success(self, state: _PolledDevice, payload: Dict[str, Any]):
+        if state.consecutive_failures and self._logger:
+            self._logger.info(
+                "Power device %s reachable again after %s failed polls",
+                state.device_id,
+                state.consecutive_failures,
+            )
+        state.consecutive_failures = 0
+
+        power = self._power_of(payload)
+        previous, state.last_power = state.last_power, power
+        if power is None or previous is None:
+            state.stable_polls = 0
+            state.interval = state.base_interval
+            return
+
+        band = max(self._adaptive["stable_band_abs"], abs(previous) * self._adaptive["stable_band_rel"])
+        if abs(power - previous) > band:
+            state.stable_polls = 0
+            state.interval = state.base_interval
+            return
+
+        state.stable_polls += 1
+        if state.stable_polls >= self._adaptive["stable_after_polls"]:
+            state.stable_polls = 0
+            state.interval = min(
+                max(state.interval, state.base_interval) * self._adaptive["stable_slowdown_factor"],
+                max(self._adaptive["max_stable_interval"], state.base_interval),
+            )
+
+    def _on_failure(self, state: _PolledDevice, error: Exception):
+        state.failures += 1
+        state.consecutive_failures += 1
+        state.stable_polls = 0
+        state.last_power = None
+        state.interval = min(
+            state.base_interval * 2 ** min(state.consecutive_failures, MAX_BACKOFF_EXPONENT),
+            max(self._adaptive["max_backoff_seconds"], state.base_interval),
+        )
+        if state.consecutive_failures == 1 and self._logger:
+            self._logger.warning(
+                "Power device %s unreachable (%s), backing off", state.device_id, error
+            )
+
+    def stop(self):
+        self._stopped.set()
+        self._wakeup.set()
+        self._executor.shutdown(wait=False)
+        for state in self._devices.values():
+            state.session.close()
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {
+                device_id: {
+                    "state": state.state,
+                    "base_interval": state.base_interval,
+                    "effective_interval": round(state.interval, 3),
+                    "effective_rate_hz": round(1.0 / state.interval, 3),
+                    "polls": state.polls,
+                    "failures": state.failures,
+                    "consecutive_failures": state.consecutive_failures,
+                    "in_flight": state.in_flight,
+                    "last_latency_ms": state.last_latency_ms,
+                }
+                for device_id, state in self._devices.items()
+            }
@@ -0,0 +1,124 @@
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import and_, case, func, or_
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+ROLLUP_RESOLUTIONS = {"1s": 1, "1m": 60, "1h": 3600}
+ROLLUP_FIELDS = ("power", "voltage", "current")
+DEFAULT_MIN_CHART_POINTS = 300
+
+
+def bucket_start(timestamp: datetime, resolution: int) -> datetime:
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    epoch = int(timestamp.timestamp())
+    return datetime.fromtimestamp(epoch - epoch % resolution, timezone.utc)
+
+
+def aggregate_samples(
+    samples: Iterable[Dict[str, Any]], resolutions: Iterable[int] = ROLLUP_RESOLUTIONS.values()
+) -> List[Dict[str, Any]]:
+    """Fold raw samples into one partial rollup row per device, tier and bucket."""
+    resolutions = tuple(resolutions)
+    buckets: Dict[Tuple[str, int, datetime], Dict[str, Any]] = {}
+
+    for sample in samples:
+        timestamp = sample["timestamp"]
+        for resolution in resolutions:
+            key = (sample["device_id"], resolution, bucket_start(timestamp, resolution))
+            bucket = buckets.get(key)
+            if bucket is None:
+                bucket = {
+                    "device_id": key[0],
+                    "resolution": resolution,
+                    "bucket_start": key[2],
+                    "sample_count": 0,
+                    "energy_last": None,
+                    "last_timestamp": timestamp,
+                }
+                for field in ROLLUP_FIELDS:
+                    bucket[f"{field}_min"] = None
+                    bucket[f"{field}_max"] = None
+                    bucket[f"{field}_sum"] = 0.0
+                    bucket[f"{field}_last"] = None
+                buckets[key] = bucket
+
+            bucket["sample_count"] += 1
+            is_latest = timestamp >= bucket["last_timestamp"]
+            if is_latest:
+                bucket["last_timestamp"] = timestamp
+                if sample.get("energy") is not None:
+                    bucket["energy_last"] = sample["energy"]
+
+            for field in ROLLUP_FIELDS:
+                value = sample.get(field)
+                if value is None:
+                    continue
+                if bucket[f"{field}_min"] is None or value < bucket[f"{field}_min"]:
+                    bucket[f"{field}_min"] = value
+                if bucket[f"{field}_max"] is None or value > bucket[f"{field}_max"]:
+                    bucket[f"{field}_max"] = value
+                bucket[f"{field}_sum"] += value
+                if is_latest or bucket[f"{field}_last"] is None:
+                    bucket[f"{field}_last"] = value
+
+    return list(buckets.values())
+
+
+def upsert_statement(table):
+    """INSERT ... ON CONFLICT that merges a partial bucket into the stored one."""
+    statement = sqlite_insert(table)
+    stored = table.c
+    incoming = statement.excluded
+    incoming_is_newer = or_(
+        stored.last_timestamp.is_(None), incoming.last_timestamp >= stored.last_timestamp
+    )
+
+    merged = {
+        "sample_count": stored.sample_count + incoming.sample_count,
+        "last_timestamp": case(
+            (incoming_is_newer, incoming.last_timestamp), else_=stored.last_timestamp
+        ),
+        "energy_last": case(
+            (and_(incoming_is_newer, incoming.energy_last.isnot(None)), incoming.energy_last),
+            else_=stored.energy_last,
+        ),
+    }
+    for field in ROLLUP_FIELDS:
+        stored_min, incoming_min = stored[f"{field}_min"], incoming[f"{field}_min"]
+        stored_max, incoming_max = stored[f"{field}_max"], incoming[f"{field}_max"]
+        stored_last, incoming_last = stored[f"{field}_last"], incoming[f"{field}_last"]
+        merged[f"{field}_min"] = func.min(
+            func.coalesce(stored_min, incoming_min), func.coalesce(incoming_min, stored_min)
+        )
+        merged[f"{field}_max"] = func.max(
+            func.coalesce(stored_max, incoming_max), func.coalesce(incoming_max, stored_max)
+        )
+        merged[f"{field}_sum"] = stored[f"{field}_sum"] + incoming[f"{field}_sum"]
+        merged[f"{field}_last"] = case(
+            (and_(incoming_is_newer, incoming_last.isnot(None)), incoming_last),
+            else_=func.coalesce(stored_last, incoming_last),
+        )
+
+    return statement.on_conflict_do_update(
+        index_elements=[stored.device_id, stored.resolution, stored.bucket_start],
+        set_=merged,
+    )
+
+
+def choose_resolution(
+    requested: Optional[str], duration_seconds: int, min_points: int = DEFAULT_MIN_CHART_POINTS
+) -> Optional[int]:
+    """Map the ``resolution`` query argument to a tier in seconds, or None for raw rows."""
+    if not requested or requested == "raw":
+        return None
+    if requested in ROLLUP_RESOLUTIONS:
+        return ROLLUP_RESOLUTIONS[requested]
+    if requested != "auto":
+        raise ValueError(f"Unknown resolution: {requested}")
+
+    for resolution in sorted(ROLLUP_RESOLUTIONS.values(), reverse=True):
+        if duration_seconds / resolution >= min_points:
+            return resolution
+    return None
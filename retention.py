@@ -0,0 +1,173 @@
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import and_, delete, func, select
+
+RETENTION_INTERVAL_SECONDS = 600
+RETENTION_BATCH_SIZE = 500
+RETENTION_PAUSE_SECONDS = 0.05
+RETENTION_INITIAL_DELAY_SECONDS = 60
+
+
+class _RetentionPolicy:
+    def __init__(self, name: str, table, timestamp_column, retention_days: float, where=None):
+        self.name = name
+        self.table = table
+        self.timestamp_column = timestamp_column
+        self.retention_days = retention_days
+        self.where = where
+        self.stats: Dict[str, Any] = {
+            "retention_days": retention_days,
+            "backlog": None,
+            "deleted_total": 0,
+            "last_run": None,
+            "last_deleted": 0,
+            "last_batches": 0,
+            "last_duration_s": None,
+            "last_rows_per_sec": None,
+            "last_error": None,
+        }
+
+
+class RetentionEngine:
+    """Deletes expired rows in small primary-key ordered batches.
+
+    Each batch is its own short transaction and the engine yields between
+    batches, so ingest writers only ever wait for one batch at a time.
+    """
+
+    def __init__(
+        self,
+        db,
+        sleep: Callable[[float], None] = time.sleep,
+        batch_size: int = RETENTION_BATCH_SIZE,
+        pause_seconds: float = RETENTION_PAUSE_SECONDS,
+        interval_seconds: float = RETENTION_INTERVAL_SECONDS,
+        initial_delay_seconds: float = RETENTION_INITIAL_DELAY_SECONDS,
+        logger=None,
+    ):
+        self._db = db
+        self._sleep = sleep
+        self.batch_size = max(int(batch_size), 1)
+        self.pause_seconds = pause_seconds
+        self.interval_seconds = interval_seconds
+        self.initial_delay_seconds = initial_delay_seconds
+        self._logger = logger
+        self._policies: List[_RetentionPolicy] = []
+        self._lock = threading.Lock()
+
+    def register(self, name: str, table, timestamp_column, retention_days: Optional[float], where=None):
+        """Add a table to the cleanup cycle. ``retention_days`` of 0/None keeps rows forever."""
+        if not retention_days or retention_days <= 0:
+            return
+        with self._lock:
+            if any(policy.name == name for policy in self._policies):
+                return
+            self._policies.append(
+                _RetentionPolicy(name, table, timestamp_column, retention_days, where)
+            )
+
+    def _expired_clause(self, policy: _RetentionPolicy, cutoff: datetime):
+        clause = policy.timestamp_column < cutoff
+        if policy.where is not None:
+            clause = and_(clause, policy.where)
+        return clause
+
+    def _purge(self, policy: _RetentionPolicy):
+        session = self._db.session
+        cutoff = datetime.utcnow() - timedelta(days=policy.retention_days)
+        expired = self._expired_clause(policy, cutoff)
+        id_column = policy.table.c.id
+
+        backlog = session.execute(
+            select(func.count()).select_from(policy.table).where(expired)
+        ).scalar() or 0
+        session.commit()
+        policy.stats["backlog"] = backlog
+
+        deleted = 0
+        batches = 0
+        busy_seconds = 0.0
+        started = time.monotonic()
+        while backlog > 0:
+            batch_ids = (
+                select(id_column).where(expired).order_by(id_column).limit(self.batch_size)
+            )
+            batch_started = time.monotonic()
+            result = session.execute(delete(policy.table).where(id_column.in_(batch_ids)))
+            session.commit()
+            busy_seconds += time.monotonic() - batch_started
+
+            removed = result.rowcount or 0
+            deleted += removed
+            batches += 1
+            backlog = max(backlog - removed, 0)
+            policy.stats["backlog"] = backlog
+            policy.stats["deleted_total"] += removed
+            if removed < self.batch_size:
+                break
+            self._sleep(self.pause_seconds)
+
+        policy.stats.update(
+            {
+                "last_run": datetime.utcnow().isoformat(),
+                "last_deleted": deleted,
+                "last_batches": batches,
+                "last_duration_s": round(time.monotonic() - started, 3),
+                "last_rows_per_sec": round(deleted / busy_seconds, 1) if busy_seconds else None,
+                "last_error": None,
+            }
+        )
+        if deleted and self._logger:
+            self._logger.info(
+                "Retention removed %s rows from %s in %s batches (%s rows/s)",
+                deleted,
+                policy.name,
+                batches,
+                policy.stats["last_rows_per_sec"],
+            )
+
+    def run_once(self):
+        with self._lock:
+            policies = list(self._policies)
+        for policy in policies:
+            try:
+                self._purge(policy)
+            except Exception as exc:
+                self._db.session.rollback()
+                policy.stats["last_error"] = str(exc)
+                if self._logger:
+                    self._logger.exception("Retention cleanup of %s failed", policy.name)
+
+    def run(self, app):
+        self._sleep(self.initial_delay_seconds)
+        with app.app_context():
+            while True:
+                self.run_once()
+                self._sleep(self.interval_seconds)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {policy.name: dict(policy.stats) for policy in self._policies}
+
+
+def get_retention_engine(app, db, socketio) -> RetentionEngine:
+    """Return the app-wide retention engine, starting it on first use."""
+    engine = app.extensions.get("retention")
+    if engine is None:
+        engine = RetentionEngine(
+            db,
+            sleep=socketio.sleep,
+            batch_size=app.config.get("RETENTION_BATCH_SIZE", RETENTION_BATCH_SIZE),
+            pause_seconds=app.config.get("RETENTION_PAUSE_SECONDS", RETENTION_PAUSE_SECONDS),
+            interval_seconds=app.config.get("RETENTION_INTERVAL_SECONDS", RETENTION_INTERVAL_SECONDS),
+            initial_delay_seconds=app.config.get(
+                "RETENTION_INITIAL_DELAY_SECONDS", RETENTION_INITIAL_DELAY_SECONDS
+            ),
+            logger=app.logger,
+        )
+        app.extensions["retention"] = engine
+        socketio.start_background_task(engine.run, app)
+    return engine
@@ -0,0 +1,57 @@
+from typing import Any, Dict, List, Tuple
+
+SCENE_DEADLINE_SECONDS = 3.0
+LED_COMMANDS = {"on", "off"}
+SOCKET_COMMANDS = {"on", "off", "toggle"}
+
+
+def _command(value: Any) -> str:
+    # YAML reads unquoted on/off as booleans.
+    if isinstance(value, bool):
+        return "on" if value else "off"
+    return str(value).lower()
+
+
+def resolve_targets(
+    spec: Dict[str, Any],
+    esp_devices: Dict[str, Dict[str, Any]],
+    socket_devices: Dict[str, Dict[str, Any]],
+) -> Tuple[Dict[str, str], List[Dict[str, str]]]:
+    """Expand a scene into ``({"esp:ID"|"socket:ID": command}, errors)``.
+
+    ``spec`` may name single devices (``devices: {ID: on}``) and whole rooms
+    (``rooms: {Bad: off}``); a room covers every ESP with a ``Led`` and
+    every plug with a ``Socket`` element in it. Device entries override
+    room entries.
+    """
+    targets: Dict[str, str] = {}
+    errors: List[Dict[str, str]] = []
+
+    for room, command in (spec.get("rooms") or {}).items():
+        command = _command(command)
+        members = 0
+        for device_id, device in esp_devices.items():
+            if device.get("room") == room and "Led" in device.get("elements", []):
+                if command in LED_COMMANDS:
+                    targets[f"esp:{device_id}"] = command
+                    members += 1
+        for device_id, device in socket_devices.items():
+            if device.get("room") == room and "Socket" in device.get("elements", []):
+                if command in SOCKET_COMMANDS:
+                    targets[f"socket:{device_id}"] = command
+                    members += 1
+        if not members:
+            errors.append({"target": f"room:{room}", "error": "No controllable devices"})
+
+    for device_id, command in (spec.get("devices") or {}).items():
+        command = _command(command)
+        if device_id in socket_devices and command in SOCKET_COMMANDS:
+            targets[f"socket:{device_id}"] = command
+        elif device_id in esp_devices and command in LED_COMMANDS:
+            targets[f"esp:{device_id}"] = command
+        elif device_id in esp_devices or device_id in socket_devices:
+            errors.append({"target": device_id, "error": f"Unsupported command {command}"})
+        else:
+            errors.append({"target": device_id, "error": "Unknown device"})
+
+    return targets, errors
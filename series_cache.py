@@ -0,0 +1,169 @@
+import threading
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# About 24 bytes per cached row, so this bounds the cache near 24 MiB
+# (roughly two years of one-minute readings of one sensor).
+CACHE_MAX_ROWS = 1_000_000
+
+Row = Tuple[datetime, float, float]
+
+
+class SeriesColumns:
+    """Rows of one series as packed NumPy columns, sorted by timestamp.
+
+    A ``(datetime, float, float)`` tuple costs well over 100 bytes; the
+    same row packed here costs 24.
+    """
+
+    __slots__ = ("timestamps", "temperatures", "humidities")
+
+    def __init__(self, timestamps: np.ndarray, temperatures: np.ndarray, humidities: np.ndarray):
+        self.timestamps = timestamps
+        self.temperatures = temperatures
+        self.humidities = humidities
+
+    @classmethod
+    def from_rows(cls, rows: Sequence[Row]) -> "SeriesColumns":
+        return cls(
+            np.array([row[0] for row in rows], dtype="datetime64[us]"),
+            np.array([row[1] for row in rows], dtype=np.float64),
+            np.array([row[2] for row in rows], dtype=np.float64),
+        )
+
+    @classmethod
+    def concatenate(cls, parts: Sequence["SeriesColumns"]) -> "SeriesColumns":
+        if not parts:
+            return cls.from_rows([])
+        return cls(
+            np.concatenate([part.timestamps for part in parts]),
+            np.concatenate([part.temperatures for part in parts]),
+            np.concatenate([part.humidities for part in parts]),
+        )
+
+    def between(self, start: datetime, end: datetime) -> "SeriesColumns":
+        """The rows in ``[start, end)``, found by binary search."""
+        lo, hi = np.searchsorted(
+            self.timestamps, np.array([start, end], dtype="datetime64[us]"), side="left"
+        )
+        return self.take(slice(lo, hi))
+
+    def take(self, indices) -> "SeriesColumns":
+        return SeriesColumns(self.timestamps[indices], self.temperatures[indices], self.humidities[indices])
+
+    def rows(self) -> Iterator[Row]:
+        return zip(self.timestamps.astype(object), self.temperatures.tolist(), self.humidities.tolist())
+
+    @property
+    def nbytes(self) -> int:
+        return self.timestamps.nbytes + self.temperatures.nbytes + self.humidities.nbytes
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+
+def iter_day_segments(start: datetime, end: datetime) -> Iterator[Tuple[date, datetime, datetime]]:
+    """Split ``[start, end)`` at UTC midnights into ``(day, segment_start, segment_end)``."""
+    current = start
+    while current < end:
+        day = current.date()
+        next_midnight = datetime.combine(day + timedelta(days=1), datetime.min.time())
+        segment_end = min(end, next_midnight)
+        yield day, current, segment_end
+        current = segment_end
+
+
+def is_complete_day(day: date, segment_start: datetime, segment_end: datetime, now: datetime) -> bool:
+    """True if the segment covers the whole day and that day is already over."""
+    day_start = datetime.combine(day, datetime.min.time())
+    day_end = day_start + timedelta(days=1)
+    return segment_start == day_start and segment_end == day_end and day_end <= now
+
+
+def merge_ranges(ranges: List[Tuple[datetime, datetime]]) -> List[Tuple[datetime, datetime]]:
+    """Join ``[start, end)`` ranges that touch or overlap into as few ranges as possible."""
+    merged: List[Tuple[datetime, datetime]] = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+class DaySeriesCache:
+    """LRU of the packed rows of completed (device, UTC day) series.
+
+    Past days normally never change, so they are served from memory. Late
+    readings for a past day must ``invalidate`` it. A reader takes the
+    ``generation`` of a day before it queries the rows and passes it to
+    ``put``; if the day was invalidated meanwhile, the possibly stale rows
+    are not cached. The cache is bounded by its total number of rows.
+    """
+
+    def __init__(self, max_rows: int = CACHE_MAX_ROWS):
+        self._entries: "OrderedDict[Tuple[str, date], SeriesColumns]" = OrderedDict()
+        self._max_rows = max_rows
+        self._rows = 0
+        # Bumped by every invalidation; days that never changed are at 0.
+        self._generations: Dict[Tuple[str, date], int] = {}
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._stale_puts = 0
+
+    def get(self, device_id: str, day: date) -> Optional[SeriesColumns]:
+        key = (device_id, day)
+        with self._lock:
+            rows = self._entries.get(key)
+            if rows is None:
+                self._misses += 1
+                return None
+            self._hits += 1
+            self._entries.move_to_end(key)
+            return rows
+
+    def generation(self, device_id: str, day: date) -> int:
+        with self._lock:
+            return self._generations.get((device_id, day), 0)
+
+    def put(self, device_id: str, day: date, rows: SeriesColumns, generation: int = 0) -> bool:
+        """Cache ``rows`` unless the day was invalidated since ``generation`` was taken."""
+        with self._lock:
+            if self._generations.get((device_id, day), 0) != generation:
+                self._stale_puts += 1
+                return False
+            if len(rows) > self._max_rows:
+                return False
+            self._drop((device_id, day))
+            self._entries[(device_id, day)] = rows
+            self._rows += len(rows)
+            while self._rows > self._max_rows:
+                _, evicted = self._entries.popitem(last=False)
+                self._rows -= len(evicted)
+            return True
+
+    def _drop(self, key: Tuple[str, date]):
+        rows = self._entries.pop(key, None)
+        if rows is not None:
+            self._rows -= len(rows)
+
+    def invalidate(self, device_id: str, day: date):
+        with self._lock:
+            self._drop((device_id, day))
+            self._generations[(device_id, day)] = self._generations.get((device_id, day), 0) + 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "days": len(self._entries),
+                "rows": self._rows,
+                "max_rows": self._max_rows,
+                "bytes": sum(rows.nbytes for rows in self._entries.values()),
+                "hits": self._hits,
+                "misses": self._misses,
+                "stale_puts": self._stale_puts,
+            }
@@ -0,0 +1,125 @@
+from datetime import datetime
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+BACKFILL_CHUNK_ROWS = 50000
+
+# (start_time, end_time); end_time is None while the shower is still open.
+Event = Tuple[datetime, Optional[datetime]]
+
+
+def _run_triggers(mask: np.ndarray, samples: int) -> np.ndarray:
+    """Indices where a run of ``True`` in ``mask`` reaches ``samples`` elements."""
+    if len(mask) < samples:
+        return np.array([], dtype=np.int64)
+    padded = np.concatenate(([False], mask, [False])).astype(np.int8)
+    edges = np.diff(padded)
+    run_starts = np.flatnonzero(edges == 1)
+    run_ends = np.flatnonzero(edges == -1)
+    long_runs = (run_ends - run_starts) >= samples
+    return run_starts[long_runs] + samples - 1
+
+
+class ShowerBackfill:
+    """Offline replay of the live shower rules over sorted humidity chunks.
+
+    Matches ``ShowerDetector``: a shower starts when ``samples`` consecutive
+    readings are above the threshold (at the first of them) and ends when
+    ``samples`` consecutive readings are below it (at the last of them).
+    Runs are found per chunk with NumPy; the last ``samples - 1`` readings
+    are carried into the next chunk so runs that cross a chunk boundary are
+    still seen.
+    """
+
+    def __init__(self, humidity_threshold: float, samples: int, open_start: Optional[datetime] = None):
+        self.humidity_threshold = float(humidity_threshold)
+        self.samples = max(int(samples), 1)
+        self.open_start = open_start
+        self._carry_times = np.array([], dtype=object)
+        self._carry_values = np.array([], dtype=np.float64)
+
+    @property
+    def is_open(self) -> bool:
+        return self.open_start is not None
+
+    def carry_in(self, timestamps: Sequence[datetime], humidity: Sequence[float]):
+        """Prime the window with readings that precede the replayed range."""
+        times = np.asarray(list(timestamps), dtype=object)
+        tail = max(len(times) - (self.samples - 1), 0)
+        self._carry_times = times[tail:]
+        self._carry_values = np.asarray(humidity, dtype=np.float64)[tail:]
+
+    def feed(self, timestamps: Sequence[datetime], humidity: Sequence[float]) -> List[Event]:
+        """Process the next chunk and return the events that closed in it."""
+        carried = len(self._carry_times)
+        times = np.concatenate((self._carry_times, np.asarray(list(timestamps), dtype=object)))
+        values = np.concatenate((self._carry_values, np.asarray(humidity, dtype=np.float64)))
+
+        # Triggers inside the carried readings were already seen last chunk.
+        starts = _run_triggers(values > self.humidity_threshold, self.samples)
+        ends = _run_triggers(values < self.humidity_threshold, self.samples)
+        starts = starts[starts >= carried]
+        ends = ends[ends >= carried]
+
+        events: List[Event] = []
+        position = carried
+        while True:
+            if self.is_open:
+                index = np.searchsorted(ends, position)
+                if index == len(ends):
+                    break
+                trigger = ends[index]
+                events.append((self.open_start, times[trigger]))
+                self.open_start = None
+            else:
+                index = np.searchsorted(starts, position)
+                if index == len(starts):
+                    break
+                trigger = starts[index]
+                self.open_start = times[trigger - self.samples + 1]
+            position = trigger + 1
+
+        tail = max(len(times) - (self.samples - 1), 0)
+        self._carry_times = times[tail:]
+        self._carry_values = values[tail:]
+        return events
+
+    def settled_before(self, time: datetime) -> bool:
+        """True if no shower that starts before ``time`` is open or can still start."""
+        if self.is_open:
+            return False
+        # Only a run through the carried readings can still trigger.
+        return not len(self._carry_times) or self._carry_times[0] >= time
+
+    def finish(self) -> List[Event]:
+        return [(self.open_start, None)] if self.is_open else []
+
+
+def detect_events(
+    chunks: Iterable[Tuple[Sequence[datetime], Sequence[float]]],
+    humidity_threshold: float,
+    samples: int,
+    open_start: Optional[datetime] = None,
+    preceding: Optional[Tuple[Sequence[datetime], Sequence[float]]] = None,
+    stop_after: Optional[datetime] = None,
+) -> List[Event]:
+    """Replay all chunks and return every event in order.
+
+    ``open_start`` and ``preceding`` describe the state before the first
+    chunk: the start of a shower that is already open and the readings
+    just before the range. With ``stop_after``, reading stops once no
+    shower that starts before it is open or can still start, so a range
+    backfill only reads far enough to close its last event.
+    """
+    backfill = ShowerBackfill(humidity_threshold, samples, open_start)
+    if preceding:
+        backfill.carry_in(*preceding)
+    events: List[Event] = []
+    for timestamps, humidity in chunks:
+        if not len(timestamps):
+            continue
+        events.extend(backfill.feed(timestamps, humidity))
+        if stop_after is not None and timestamps[-1] >= stop_after and backfill.settled_before(stop_after):
+            return events
+    return events + backfill.finish()
@@ -0,0 +1,95 @@
+import threading
+from collections import deque
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+DEFAULT_SHOWER_SETTINGS = {
+    "humidity_threshold": 75.0,
+    "samples": 3,
+}
+
+
+class ShowerDetector:
+    """Streaming shower detection for one humidity sensor.
+
+    A shower starts once the last ``samples`` readings are all above
+    ``humidity_threshold`` (the event starts at the oldest of them) and ends
+    once the last ``samples`` readings are all below it (the event ends at
+    the newest). Only a small ring buffer of recent readings is kept.
+    """
+
+    def __init__(self, humidity_threshold: float, samples: int):
+        self.humidity_threshold = float(humidity_threshold)
+        self.samples = max(int(samples), 1)
+        self.recent: "deque[Tuple[datetime, float]]" = deque(maxlen=self.samples)
+        self.open_event_id: Optional[int] = None
+        self.lock = threading.Lock()
+
+    def seed(self, recent: Iterable[Tuple[datetime, float]], open_event_id: Optional[int]):
+        self.recent.clear()
+        self.recent.extend(sorted(recent)[-self.samples:])
+        self.open_event_id = open_event_id
+
+    @property
+    def last_timestamp(self) -> Optional[datetime]:
+        return self.recent[-1][0] if self.recent else None
+
+    def evaluate(self, timestamp: datetime, humidity: float) -> Optional[Tuple[str, datetime]]:
+        """Return ``('start'|'end', time)`` if this reading changes the state.
+
+        Nothing is recorded until ``accept`` is called, so a failed write
+        leaves the detector untouched.
+        """
+        window = list(self.recent)[1 - self.samples:] if self.samples > 1 else []
+        window.append((timestamp, humidity))
+        if len(window) < self.samples:
+            return None
+
+        humidities = [value for _, value in window]
+        if self.open_event_id is None and all(value > self.humidity_threshold for value in humidities):
+            return "start", window[0][0]
+        if self.open_event_id is not None and all(value < self.humidity_threshold for value in humidities):
+            return "end", window[-1][0]
+        return None
+
+    def accept(self, timestamp: datetime, humidity: float, transition=None, event_id: Optional[int] = None):
+        self.recent.append((timestamp, humidity))
+        if transition and transition[0] == "start":
+            self.open_event_id = event_id
+        elif transition and transition[0] == "end":
+            self.open_event_id = None
+
+
+class ShowerDetectorRegistry:
+    """Holds one detector per device, seeded from the database on first use."""
+
+    def __init__(
+        self,
+        seed: Callable[[str, int], Tuple[Iterable[Tuple[datetime, float]], Optional[int]]],
+        defaults: Optional[Dict[str, Any]] = None,
+        device_settings: Optional[Dict[str, Dict[str, Any]]] = None,
+    ):
+        self._seed = seed
+        self._defaults = {**DEFAULT_SHOWER_SETTINGS, **(defaults or {})}
+        self._device_settings = device_settings or {}
+        self._detectors: Dict[str, ShowerDetector] = {}
+        self._lock = threading.Lock()
+
+    def settings_for(self, device_id: str) -> Dict[str, Any]:
+        return {**self._defaults, **(self._device_settings.get(device_id) or {})}
+
+    def get(self, device_id: str) -> ShowerDetector:
+        with self._lock:
+            detector = self._detectors.get(device_id)
+            if detector is None:
+                settings = self.settings_for(device_id)
+                detector = ShowerDetector(settings["humidity_threshold"], settings["samples"])
+                recent, open_event_id = self._seed(device_id, detector.samples)
+                detector.seed(recent, open_event_id)
+                self._detectors[device_id] = detector
+            return detector
+
+    def reset(self, device_id: str):
+        """Drop a detector so the next reading reseeds it from the database."""
+        with self._lock:
+            self._detectors.pop(device_id, None)
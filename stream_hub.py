@@ -0,0 +1,187 @@
+import threading
+import time
+from typing import Any, Dict, Optional, Set, Tuple
+
+from flask import request
+from flask_socketio import join_room, leave_room
+
+RATE_TIERS_HZ = (1, 2, 5, 10)
+DEFAULT_RATE_HZ = 5
+ALL_DEVICES = "*"
+
+
+def _rate_tier(max_rate: Any) -> int:
+    try:
+        requested = float(max_rate)
+    except (TypeError, ValueError):
+        return DEFAULT_RATE_HZ
+    eligible = [tier for tier in RATE_TIERS_HZ if tier <= requested]
+    return eligible[-1] if eligible else RATE_TIERS_HZ[0]
+
+
+def room_name(stream: str, device_id: str, rate_hz: int) -> str:
+    return f"{stream}:{device_id}@{rate_hz}"
+
+
+class _Room:
+    def __init__(self, name: str, source: Tuple[str, str], rate_hz: int):
+        self.name = name
+        self.source = source
+        self.event: Optional[str] = None
+        self.min_interval = 1.0 / rate_hz
+        self.members: Set[str] = set()
+        self.last_emit = 0.0
+        self.pending: Optional[Dict[str, Any]] = None
+
+
+class StreamHub:
+    """Fans out live samples to the clients that asked for them.
+
+    Clients emit ``subscribe`` with a ``stream``, a ``device_id`` (or ``*``)
+    and an optional ``max_rate`` in Hz. Subscribers are grouped into one
+    Socket.IO room per stream, device and rate tier. Each room receives at
+    most ``rate`` updates per second; bursts in between are coalesced to
+    the latest payload.
+    """
+
+    def __init__(self, socketio):
+        self._socketio = socketio
+        self._rooms: Dict[str, _Room] = {}
+        self._rooms_by_source: Dict[Tuple[str, str], Set[str]] = {}
+        self._client_rooms: Dict[str, Set[str]] = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._flusher_started = False
+
+        socketio.on_event("subscribe", self._on_subscribe)
+        socketio.on_event("unsubscribe", self._on_unsubscribe)
+        socketio.on_event("disconnect", self._on_disconnect)
+
+    def _on_subscribe(self, data):
+        data = data or {}
+        stream, device_id = data.get("stream"), data.get("device_id")
+        if not stream or not device_id:
+            return
+        rate_hz = _rate_tier(data.get("max_rate", DEFAULT_RATE_HZ))
+        name = room_name(stream, device_id, rate_hz)
+        sid = request.sid
+
+        with self._lock:
+            room = self._rooms.get(name)
+            if room is None:
+                room = _Room(name, (stream, device_id), rate_hz)
+                self._rooms[name] = room
+                self._rooms_by_source.setdefault(room.source, set()).add(name)
+            room.members.add(sid)
+            self._client_rooms.setdefault(sid, set()).add(name)
+        join_room(name)
+
+    def _on_unsubscribe(self, data):
+        data = data or {}
+        stream, device_id = data.get("stream"), data.get("device_id")
+        sid = request.sid
+        with self._lock:
+            names = [
+                name
+                for name in self._client_rooms.get(sid, set())
+                if name in self._rooms_by_source.get((stream, device_id), set())
+            ]
+            for name in names:
+                self._leave(sid, name)
+        for name in names:
+            leave_room(name)
+
+    def _on_disconnect(self, *_args):
+        sid = request.sid
+        with self._lock:
+            for name in list(self._client_rooms.get(sid, set())):
+                self._leave(sid, name)
+            self._client_rooms.pop(sid, None)
+
+    def _leave(self, sid: str, name: str):
+        self._client_rooms.get(sid, set()).discard(name)
+        room = self._rooms.get(name)
+        if room is None:
+            return
+        room.members.discard(sid)
+        if not room.members:
+            del self._rooms[name]
+            names = self._rooms_by_source.get(room.source, set())
+            names.discard(name)
+            if not names:
+                self._rooms_by_source.pop(room.source, None)
+
+    def publish(self, stream: str, device_id: str, event: str, payload: Dict[str, Any]):
+        """Queue ``payload`` for every room interested in this device."""
+        now = time.monotonic()
+        due = []
+        schedule_flush = False
+        with self._lock:
+            names = self._rooms_by_source.get((stream, device_id), set()) | self._rooms_by_source.get(
+                (stream, ALL_DEVICES), set()
+            )
+            for name in names:
+                room = self._rooms[name]
+                room.event = event
+                if now - room.last_emit >= room.min_interval:
+                    room.last_emit = now
+                    room.pending = None
+                    due.append(room)
+                else:
+                    room.pending = payload
+                    schedule_flush = True
+
+            if schedule_flush and not self._flusher_started:
+                self._flusher_started = True
+                self._socketio.start_background_task(self._flush_loop)
+
+        for room in due:
+            self._socketio.emit(room.event, payload, to=room.name)
+        if schedule_flush:
+            self._wakeup.set()
+
+    def _flush_loop(self):
+        while True:
+            self._wakeup.wait(1.0)
+            self._wakeup.clear()
+
+            while True:
+                now = time.monotonic()
+                due = []
+                next_due = None
+                with self._lock:
+                    for room in self._rooms.values():
+                        if room.pending is None:
+                            continue
+                        ready_at = room.last_emit + room.min_interval
+                        if ready_at <= now:
+                            due.append((room.event, room.name, room.pending))
+                            room.pending = None
+                            room.last_emit = now
+                        elif next_due is None or ready_at < next_due:
+                            next_due = ready_at
+
+                for event, name, payload in due:
+                    self._socketio.emit(event, payload, to=name)
+                if next_due is None:
+                    break
+                self._socketio.sleep(max(next_due - time.monotonic(), 0.0))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "clients": len(self._client_rooms),
+                "rooms": {name: len(room.members) for name, room in self._rooms.items()},
+            }
+
+
+_hubs: Dict[int, StreamHub] = {}
+
+
+def get_stream_hub(socketio) -> StreamHub:
+    """Return the hub bound to ``socketio``, registering its handlers once."""
+    hub = _hubs.get(id(socketio))
+    if hub is None:
+        hub = StreamHub(socketio)
+        _hubs[id(socketio)] = hub
+    return hub
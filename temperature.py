@@ -1,11 +1,55 @@
-from datetime import datetime, timedelta
+import atexit
+from contextlib import ExitStack
+from datetime import datetime, timedelta, timezone
+import math
 import os
+import time
 
-from flask import Blueprint, render_template, request, jsonify
+import click
+from flask import Blueprint, current_app, render_template, request, jsonify
 from flask_socketio import SocketIO
+import numpy as np
+from sqlalchemy import or_, select
 import yaml
 
-from models import ShowerEvent
+from downsampling import MIN_MAX_POINTS, downsample_indices
+from ingest_spool import IngestSpool
+from latest_readings import get_latest_readings
+from models import IngestBatch, ShowerEvent, TemperatureData, TemperatureDaily
+from retention import get_retention_engine
+from series_cache import (
+    CACHE_MAX_ROWS,
+    DaySeriesCache,
+    SeriesColumns,
+    is_complete_day,
+    iter_day_segments,
+    merge_ranges,
+)
+from shower_backfill import BACKFILL_CHUNK_ROWS, detect_events
+from shower_detection import ShowerDetectorRegistry
+from stream_hub import get_stream_hub
+from temperature_rollups import (
+    DEFAULT_GROUP,
+    STATS_GROUPS,
+    STATS_PERIODS,
+    aggregate_daily,
+    daily_upsert_statement,
+    summarize,
+)
+from timeseries_export import CHUNK_ROWS, EXPORT_FORMATS, epoch_ms, export_response
+
+# Raw readings are kept forever unless TEMPERATURE_RETENTION_DAYS is configured.
+TEMPERATURE_RETENTION_DAYS = 0
+MAX_BATCH_READINGS = 1000
+MAX_SERIES_DAYS = 366
+# Sensors without a clock sync report 1970; clocks running ahead would pin
+# the shower detector and the latest-reading cache in the future.
+MIN_READING_TIMESTAMP = datetime(2020, 1, 1)
+MAX_CLOCK_SKEW = timedelta(minutes=5)
+MAX_DEVICE_ID_LENGTH = 50
+# Replays only happen for lines still in the spool, so ids can go soon.
+INGEST_BATCH_RETENTION_DAYS = 7
+INGEST_SPOOL_DIR = os.path.join(os.path.dirname(__file__), 'spool')
 
 
 def load_devices_from_config():
@@ -15,49 +59,417 @@ def load_devices_from_config():
     return config.get('devices', {})
 
 
+def _parse_reading_timestamp(reading, received_at):
+    if reading.get('age_seconds') is not None:
+        age_seconds = float(reading['age_seconds'])
+        if not age_seconds >= 0:
+            raise ValueError('age_seconds must not be negative')
+        return received_at - timedelta(seconds=age_seconds)
+
+    value = reading.get('timestamp')
+    if value is None:
+        return received_at
+    if isinstance(value, (int, float)):
+        return datetime.fromtimestamp(value, timezone.utc).replace(tzinfo=None)
+
+    parsed = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def _rebuild_spooled_reading(reading):
+    if not isinstance(reading['device_id'], str):
+        raise ValueError('Spooled reading has an invalid device_id')
+    return {
+        'device_id': reading['device_id'],
+        'temperature': float(reading['temperature']),
+        'humidity': float(reading['humidity']),
+        'timestamp': datetime.fromisoformat(reading['timestamp']),
+    }
+
+
+def _parse_range_bound(value):
+    """Parse an ISO 8601 date or datetime into a naive UTC datetime."""
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def _parse_batch(payload, received_at):
+    """Normalise a batch upload into reading dicts.
+
+    Accepts either a list of readings or ``{"device_id": ..., "readings": [...]}``.
+    Each reading needs ``temperature`` and ``humidity`` and may carry its own
+    ``device_id`` plus either a ``timestamp`` (ISO 8601 or epoch seconds) or
+    an ``age_seconds`` relative to the upload. Timestamps must lie between
+    ``MIN_READING_TIMESTAMP`` and a few minutes after ``received_at``; any
+    invalid reading rejects the whole batch.
+    """
+    if isinstance(payload, dict):
+        default_device = payload.get('device_id')
+        raw_readings = payload.get('readings')
+    else:
+        default_device = None
+        raw_readings = payload
+
+    if not isinstance(raw_readings, list):
+        raise ValueError('Expected a list of readings')
+    if len(raw_readings) > MAX_BATCH_READINGS:
+        raise ValueError(f'At most {MAX_BATCH_READINGS} readings per batch')
+
+    readings = []
+    for index, raw in enumerate(raw_readings):
+        if not isinstance(raw, dict):
+            raise ValueError(f'Reading {index} is not an object')
+        device_id = raw.get('device_id') or default_device
+        if not device_id:
+            raise ValueError(f'Reading {index} has no device_id')
+        if not isinstance(device_id, str) or len(device_id) > MAX_DEVICE_ID_LENGTH:
+            raise ValueError(f'Reading {index} has an invalid device_id')
+        try:
+            reading = {
+                'device_id': device_id,
+                'temperature': float(raw['temperature']),
+                'humidity': float(raw['humidity']),
+                'timestamp': _parse_reading_timestamp(raw, received_at),
+            }
+        except (KeyError, TypeError, ValueError, OverflowError, OSError):
+            raise ValueError(f'Reading {index} is invalid')
+        if not (math.isfinite(reading['temperature']) and math.isfinite(reading['humidity'])):
+            raise ValueError(f'Reading {index} is invalid')
+        if not MIN_READING_TIMESTAMP <= reading['timestamp'] <= received_at + MAX_CLOCK_SKEW:
+            raise ValueError(f'Reading {index} has a timestamp out of range')
+        readings.append(reading)
+    return readings
+
+
 def create_temperature_blueprint(socketio, db):
     temperature_blueprint = Blueprint('temperature', __name__)
+    stream_hub = get_stream_hub(socketio)
+
+    daily_upsert = daily_upsert_statement(TemperatureDaily.__table__)
 
-    class TemperatureData(db.Model):
-        __tablename__ = 'temperature_data'
-        __table_args__ = {'extend_existing': True}
-        id = db.Column(db.Integer, primary_key=True)
-        device_id = db.Column(db.String(50))  # New field for device ID
-        temperature = db.Column(db.Float, nullable=False)
-        humidity = db.Column(db.Float, nullable=False)
-        timestamp = db.Column(db.DateTime, default=datetime.utcnow)
-
-    def _update_shower_events(device_id):
-        recent_samples = (
+    def _seed_shower_detector(device_id, samples):
+        recent = (
             TemperatureData.query.filter_by(device_id=device_id)
             .order_by(TemperatureData.timestamp.desc())
-            .limit(3)
+            .limit(samples)
             .all()
         )
-
-        if len(recent_samples) < 3:
-            return
-
-        humidities = [sample.humidity for sample in recent_samples]
         open_event = (
             ShowerEvent.query.filter_by(device_id=device_id, end_time=None)
             .order_by(ShowerEvent.start_time.desc())
             .first()
         )
+        return (
+            [(sample.timestamp, sample.humidity) for sample in recent],
+            open_event.id if open_event else None,
+        )
 
-        if open_event is None and all(humidity > 75 for humidity in humidities):
-            oldest_sample = min(recent_samples, key=lambda sample: sample.timestamp)
-            new_event = ShowerEvent(
-                device_id=device_id,
-                start_time=oldest_sample.timestamp,
+    def _get_shower_detectors(app):
+        detectors = app.extensions.get('shower_detectors')
+        if detectors is None:
+            try:
+                devices = load_devices_from_config()
+            except (OSError, AttributeError):
+                devices = {}
+            detectors = ShowerDetectorRegistry(
+                _seed_shower_detector,
+                defaults=app.config.get('SHOWER_DETECTION'),
+                device_settings={
+                    device_id: (details or {}).get('shower')
+                    for device_id, details in devices.items()
+                },
             )
-            db.session.add(new_event)
-            db.session.commit()
-            return
+            app.extensions['shower_detectors'] = detectors
+        return detectors
+
+    def _get_series_cache(app):
+        cache = app.extensions.get('temperature_series_cache')
+        if cache is None:
+            cache = DaySeriesCache(app.config.get('TEMPERATURE_SERIES_CACHE_ROWS', CACHE_MAX_ROWS))
+            app.extensions['temperature_series_cache'] = cache
+        return cache
+
+    def _store_readings(detectors, readings, batch_ids=()):
+        """Insert readings and the shower transitions they cause in a single commit.
+
+        Readings are fed to each device's detector in timestamp order. Late
+        readings that are older than what the detector has already seen are
+        stored but do not drive detection. ``batch_ids`` of the spool lines
+        the readings came from are recorded in the same commit.
+        """
+        by_device = {}
+        for reading in sorted(readings, key=lambda item: item['timestamp']):
+            by_device.setdefault(reading['device_id'], []).append(reading)
+
+        with ExitStack() as stack:
+            device_detectors = {}
+            for device_id in sorted(by_device):
+                detector = detectors.get(device_id)
+                stack.enter_context(detector.lock)
+                device_detectors[device_id] = detector
 
-        if open_event and all(humidity < 75 for humidity in humidities):
-            open_event.end_time = recent_samples[0].timestamp
+            try:
+                db.session.execute(TemperatureData.__table__.insert(), [
+                    {
+                        'device_id': reading['device_id'],
+                        'temperature': reading['temperature'],
+                        'humidity': reading['humidity'],
+                        'timestamp': reading['timestamp'],
+                    }
+                    for reading in readings
+                ])
+                # Daily aggregates are merged in the same transaction as the raw rows.
+                db.session.execute(daily_upsert, aggregate_daily(readings))
+                if batch_ids:
+                    db.session.execute(
+                        IngestBatch.__table__.insert(),
+                        [{'batch_id': batch_id, 'committed_at': datetime.utcnow()} for batch_id in batch_ids],
+                    )
+
+                for device_id, device_readings in by_device.items():
+                    detector = device_detectors[device_id]
+                    for reading in device_readings:
+                        timestamp, humidity = reading['timestamp'], reading['humidity']
+                        if detector.last_timestamp and timestamp <= detector.last_timestamp:
+                            continue
+
+                        transition = detector.evaluate(timestamp, humidity)
+                        event_id = None
+                        if transition and transition[0] == 'start':
+                            new_event = ShowerEvent(device_id=device_id, start_time=transition[1])
+                            db.session.add(new_event)
+                            db.session.flush()
+                            event_id = new_event.id
+                        elif transition and transition[0] == 'end':
+                            # Leave events that were closed by hand in the calendar alone.
+                            ShowerEvent.query.filter_by(
+                                id=detector.open_event_id, end_time=None
+                            ).update({'end_time': transition[1]})
+                        detector.accept(timestamp, humidity, transition, event_id)
+
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                # The detectors may have advanced past readings that were not
+                # stored; let them reseed from the database.
+                for device_id in by_device:
+                    detectors.reset(device_id)
+                raise
+
+        get_latest_readings(current_app, db).update(readings)
+
+        # Late readings change days that may already be cached.
+        series_cache = _get_series_cache(current_app)
+        today = datetime.combine(datetime.utcnow().date(), datetime.min.time())
+        for reading in readings:
+            if reading['timestamp'] < today:
+                series_cache.invalidate(reading['device_id'], reading['timestamp'].date())
+
+        for device_id, device_readings in by_device.items():
+            latest = device_readings[-1]
+            stream_hub.publish('temperature', device_id, 'new_temperature_data', {
+                'device_id': device_id,
+                'temperature': latest['temperature'],
+                'humidity': latest['humidity'],
+                'timestamp': latest['timestamp'].isoformat(),
+            })
+
+    def _humidity_chunks(device_id, start, counter):
+        rows = db.session.execute(
+            select(TemperatureData.timestamp, TemperatureData.humidity)
+            .where(TemperatureData.device_id == device_id, TemperatureData.timestamp >= start)
+            .order_by(TemperatureData.timestamp.asc())
+            .execution_options(yield_per=BACKFILL_CHUNK_ROWS)
+        )
+        for partition in rows.partitions():
+            counter['rows'] += len(partition)
+            yield [row[0] for row in partition], [row[1] for row in partition]
+
+    def _backfill_showers(device_id, start, end):
+        """Recompute the shower events of one device that start in ``[start, end)``.
+
+        Events in the range are deleted and rebuilt from the raw readings, so
+        running it twice gives the same result. A shower that was already
+        open at ``start`` gets its end recomputed. The live detector is
+        locked meanwhile and reseeded afterwards.
+        """
+        started = time.perf_counter()
+        detectors = _get_shower_detectors(current_app)
+        detector = detectors.get(device_id)
+        with detector.lock:
+            try:
+                preceding = db.session.execute(
+                    select(TemperatureData.timestamp, TemperatureData.humidity)
+                    .where(TemperatureData.device_id == device_id, TemperatureData.timestamp < start)
+                    .order_by(TemperatureData.timestamp.desc())
+                    .limit(detector.samples - 1)
+                ).all()[::-1]
+                open_before = (
+                    ShowerEvent.query.filter(
+                        ShowerEvent.device_id == device_id,
+                        ShowerEvent.start_time < start,
+                        or_(ShowerEvent.end_time.is_(None), ShowerEvent.end_time >= start),
+                    )
+                    .order_by(ShowerEvent.start_time.desc())
+                    .first()
+                )
+
+                counter = {'rows': 0}
+                events = detect_events(
+                    _humidity_chunks(device_id, start, counter),
+                    detector.humidity_threshold,
+                    detector.samples,
+                    open_start=open_before.start_time if open_before else None,
+                    preceding=([row[0] for row in preceding], [row[1] for row in preceding]),
+                    stop_after=end,
+                )
+
+                if open_before is not None and events:
+                    open_before.end_time = events.pop(0)[1]
+                ShowerEvent.query.filter(
+                    ShowerEvent.device_id == device_id,
+                    ShowerEvent.start_time >= start,
+                    ShowerEvent.start_time < end,
+                ).delete(synchronize_session=False)
+                created = [
+                    ShowerEvent(device_id=device_id, start_time=event_start, end_time=event_end)
+                    for event_start, event_end in events
+                    if start <= event_start < end
+                ]
+                db.session.add_all(created)
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+            detector.seed(*_seed_shower_detector(device_id, detector.samples))
+
+        return {
+            'device_id': device_id,
+            'events': len(created),
+            'rows_scanned': counter['rows'],
+            'seconds': round(time.perf_counter() - started, 3),
+        }
+
+    def _backfill_device_ids(device_id):
+        if device_id:
+            return [device_id]
+        stored = db.session.execute(select(TemperatureData.device_id).distinct()).scalars()
+        return sorted(device for device in stored if device)
+
+    def _drain_spooled_readings(app, batches):
+        batch_ids = [batch_id for batch_id, _ in batches if batch_id]
+        stored = set()
+        if batch_ids:
+            stored = set(db.session.execute(
+                select(IngestBatch.batch_id).where(IngestBatch.batch_id.in_(batch_ids))
+            ).scalars())
             db.session.commit()
+        if stored:
+            app.logger.info('Skipping %s replayed ingest batches', len(stored))
+
+        # Bad spooled data raises ValueError/KeyError/TypeError before the
+        # database is touched, so the spool dead-letters the line.
+        readings = [
+            _rebuild_spooled_reading(reading)
+            for batch_id, spooled in batches
+            if batch_id not in stored
+            for reading in spooled
+        ]
+        if readings:
+            _store_readings(
+                _get_shower_detectors(app),
+                readings,
+                [batch_id for batch_id in batch_ids if batch_id not in stored],
+            )
+
+    def _get_ingest_spool(app):
+        spool = app.extensions.get('temperature_ingest_spool')
+        if spool is None:
+            spool = IngestSpool(
+                app.config.get('INGEST_SPOOL_DIR', INGEST_SPOOL_DIR),
+                lambda readings: _drain_spooled_readings(app, readings),
+                fsync=app.config.get('INGEST_SPOOL_FSYNC', False),
+                logger=app.logger,
+            )
+            app.extensions['temperature_ingest_spool'] = spool
+        return spool
+
+    def _spool_readings(readings):
+        _get_ingest_spool(current_app).append([
+            {**reading, 'timestamp': reading['timestamp'].isoformat()}
+            for reading in readings
+        ])
+
+    @temperature_blueprint.record_once
+    def start_background_services(state):
+        app = state.app
+        with app.app_context():
+            try:
+                atexit.register(get_latest_readings(app, db).persist)
+            except Exception:
+                db.session.rollback()
+                app.logger.warning('Could not seed latest readings at startup', exc_info=True)
+
+            detectors = _get_shower_detectors(app)
+            try:
+                for device_id in load_devices_from_config():
+                    detectors.get(device_id)
+            except Exception:
+                # Fresh databases have no tables yet; detectors then seed on first reading.
+                db.session.rollback()
+                app.logger.warning('Could not seed shower detectors at startup', exc_info=True)
+
+        spool = _get_ingest_spool(app)
+        socketio.start_background_task(spool.run, app)
+
+        get_retention_engine(app, db, socketio).register(
+            'temperature_data',
+            TemperatureData.__table__,
+            TemperatureData.timestamp,
+            app.config.get('TEMPERATURE_RETENTION_DAYS', TEMPERATURE_RETENTION_DAYS),
+        )
+        get_retention_engine(app, db, socketio).register(
+            'ingest_batches',
+            IngestBatch.__table__,
+            IngestBatch.committed_at,
+            INGEST_BATCH_RETENTION_DAYS,
+        )
+
+    @temperature_blueprint.cli.command('backfill-showers')
+    @click.option('--device', 'device_id', default=None, help='Only this device (default: all).')
+    @click.option('--start', default=None, help='ISO date/datetime, default: first reading.')
+    @click.option('--end', default=None, help='ISO date/datetime, default: now.')
+    def backfill_showers_command(device_id, start, end):
+        """Rebuild shower events from the stored humidity readings."""
+        start = _parse_range_bound(start) if start else datetime.min
+        end = _parse_range_bound(end) if end else datetime.utcnow()
+        for current_device in _backfill_device_ids(device_id):
+            result = _backfill_showers(current_device, start, end)
+            click.echo(
+                f"{result['device_id']}: {result['events']} events from "
+                f"{result['rows_scanned']} readings in {result['seconds']} s"
+            )
+
+    @temperature_blueprint.route('/shower_events/recompute', methods=['POST'])
+    def recompute_shower_events():
+        payload = request.get_json(silent=True) or {}
+        try:
+            start = _parse_range_bound(payload['start']) if payload.get('start') else datetime.min
+            end = _parse_range_bound(payload['end']) if payload.get('end') else datetime.utcnow()
+        except (TypeError, ValueError):
+            return jsonify({"error": "Invalid start or end"}), 400
+        if start >= end:
+            return jsonify({"error": "start must be before end"}), 400
+
+        results = [
+            _backfill_showers(device_id, start, end)
+            for device_id in _backfill_device_ids(payload.get('device_id'))
+        ]
+        return jsonify(results)
 
     @temperature_blueprint.route('/temperature')
     def temperature():
@@ -77,22 +489,202 @@ def create_temperature_blueprint(socketio, db):
 
     @temperature_blueprint.route('/record_temperature', methods=['POST'])
     def record_temperature():
-        data = request.get_json()
-        new_record = TemperatureData(
-            device_id=data['device_id'],  # Handle device_id
-            temperature=data['temperature'],
-            humidity=data['humidity']
+        try:
+            readings = _parse_batch([request.get_json(silent=True)], datetime.utcnow())
+        except ValueError:
+            return jsonify({"error": "Invalid reading"}), 400
+
+        # Readings are spooled and committed by the background drainer, so
+        # the ESP gets its answer without waiting for the database.
+        _spool_readings(readings)
+        return jsonify({"message": "Data queued"}), 202
+
+    @temperature_blueprint.route('/record_temperature_batch', methods=['POST'])
+    def record_temperature_batch():
+        try:
+            readings = _parse_batch(request.get_json(silent=True), datetime.utcnow())
+        except ValueError as exc:
+            return jsonify({"error": str(exc)}), 400
+
+        if readings:
+            _spool_readings(readings)
+        return jsonify({"message": "Data queued", "count": len(readings)}), 202
+
+    @temperature_blueprint.route('/get_ingest_stats')
+    def get_ingest_stats():
+        return jsonify(_get_ingest_spool(current_app).stats())
+
+    def _iter_rows(device_id, start, end):
+        rows = db.session.execute(
+            select(TemperatureData.timestamp, TemperatureData.temperature, TemperatureData.humidity)
+            .where(
+                TemperatureData.device_id == device_id,
+                TemperatureData.timestamp.between(start, end),
+            )
+            .order_by(TemperatureData.timestamp.asc())
+            .execution_options(yield_per=CHUNK_ROWS)
+        )
+        for row in rows:
+            yield tuple(row)
+
+    def _downsample_rows(rows, max_points):
+        if len(rows) <= max_points:
+            return rows
+        timestamps = np.array([epoch_ms(row[0]) for row in rows], dtype=np.float64)
+        temperatures = np.array([row[1] for row in rows], dtype=np.float64)
+        humidities = np.array([row[2] for row in rows], dtype=np.float64)
+        keep = downsample_indices(timestamps, temperatures, humidities, max_points)
+        return [rows[index] for index in keep]
+
+    def _downsample_columns(columns, max_points):
+        if len(columns) <= max_points:
+            return columns
+        timestamps = columns.timestamps.astype('datetime64[ms]').astype(np.int64).astype(np.float64)
+        return columns.take(downsample_indices(timestamps, columns.temperatures, columns.humidities, max_points))
+
+    def _query_range(device_id, start, end):
+        """Rows of one device in ``[start, end)`` from an indexed range scan."""
+        rows = db.session.execute(
+            select(TemperatureData.timestamp, TemperatureData.temperature, TemperatureData.humidity)
+            .where(
+                TemperatureData.device_id == device_id,
+                TemperatureData.timestamp >= start,
+                TemperatureData.timestamp < end,
+            )
+            .order_by(TemperatureData.timestamp)
+            .execution_options(yield_per=CHUNK_ROWS)
+        )
+        return [tuple(row) for row in rows]
+
+    def _load_series(device_ids, start, end):
+        """Per-device ``SeriesColumns`` for ``[start, end)``; completed days come from the cache.
+
+        Only the segments that are not cached are read from the database,
+        one indexed range query per run of adjacent segments, and the rows
+        are split into days with a binary search.
+        """
+        cache = _get_series_cache(current_app)
+        now = datetime.utcnow()
+        segments = list(iter_day_segments(start, end))
+
+        parts = {}
+        missing = {}
+        for device_id in device_ids:
+            for day, segment_start, segment_end in segments:
+                cached = None
+                if is_complete_day(day, segment_start, segment_end, now):
+                    cached = cache.get(device_id, day)
+                if cached is None:
+                    # Taken before the query, so a late batch that commits
+                    # meanwhile keeps the stale rows out of the cache.
+                    generation = cache.generation(device_id, day)
+                    missing.setdefault(device_id, []).append((day, segment_start, segment_end, generation))
+                else:
+                    parts[(device_id, day)] = cached
+
+        for device_id, device_segments in missing.items():
+            rows = []
+            for range_start, range_end in merge_ranges(
+                [(segment_start, segment_end) for _, segment_start, segment_end, _ in device_segments]
+            ):
+                rows.extend(_query_range(device_id, range_start, range_end))
+            columns = SeriesColumns.from_rows(rows)
+            for day, segment_start, segment_end, generation in device_segments:
+                day_rows = columns.between(segment_start, segment_end)
+                parts[(device_id, day)] = day_rows
+                if is_complete_day(day, segment_start, segment_end, now):
+                    cache.put(device_id, day, day_rows, generation)
+
+        return {
+            device_id: SeriesColumns.concatenate([parts[(device_id, day)] for day, _, _ in segments])
+            for device_id in device_ids
+        }
+
+    @temperature_blueprint.route('/get_temperature_series')
+    def get_temperature_series():
+        device_ids = [
+            device_id for device_id in request.args.get('device_ids', '').split(',') if device_id
+        ]
+        if not device_ids:
+            return jsonify({"error": "device_ids is required"}), 400
+
+        try:
+            end = _parse_range_bound(request.args['end']) if request.args.get('end') else datetime.utcnow()
+            start = (
+                _parse_range_bound(request.args['start'])
+                if request.args.get('start') else end - timedelta(hours=24)
+            )
+        except ValueError:
+            return jsonify({"error": "Invalid start or end"}), 400
+        if start >= end:
+            return jsonify({"error": "start must be before end"}), 400
+        if end - start > timedelta(days=MAX_SERIES_DAYS):
+            return jsonify({"error": f"At most {MAX_SERIES_DAYS} days per request"}), 400
+
+        max_points = request.args.get('max_points', type=int)
+        if max_points is not None and max_points < MIN_MAX_POINTS:
+            return jsonify({"error": f"max_points must be at least {MIN_MAX_POINTS}"}), 400
+
+        series = _load_series(device_ids, start, end)
+        if max_points is not None:
+            series = {device_id: _downsample_columns(columns, max_points) for device_id, columns in series.items()}
+
+        return jsonify({
+            'start': start.isoformat(),
+            'end': end.isoformat(),
+            'series': {
+                device_id: [
+                    {
+                        'temperature': temperature,
+                        'humidity': humidity,
+                        'timestamp': timestamp.isoformat()
+                    }
+                    for timestamp, temperature, humidity in columns.rows()
+                ]
+                for device_id, columns in series.items()
+            },
+        })
+
+    @temperature_blueprint.route('/temperature/stats')
+    def temperature_stats():
+        device_id = request.args.get('device_id', 'ESP_01')
+        period = request.args.get('period', 'week')
+        if period not in STATS_PERIODS:
+            return jsonify({"error": "period must be week, month or year"}), 400
+        group = request.args.get('group', DEFAULT_GROUP[period])
+        if group not in STATS_GROUPS:
+            return jsonify({"error": "group must be day, week or month"}), 400
+
+        try:
+            end = (
+                datetime.strptime(request.args['end'], '%Y-%m-%d').date()
+                if request.args.get('end') else datetime.utcnow().date()
+            )
+        except ValueError:
+            return jsonify({"error": "Invalid date format"}), 400
+        # The period ends with (and includes) the end day.
+        start = end - timedelta(days=STATS_PERIODS[period] - 1)
+
+        rows = (
+            TemperatureDaily.query.filter(
+                TemperatureDaily.device_id == device_id,
+                TemperatureDaily.day.between(start, end),
+            )
+            .order_by(TemperatureDaily.day.asc())
+            .all()
         )
-        db.session.add(new_record)
-        db.session.commit()
-        _update_shower_events(data['device_id'])
-        # Emit the new temperature data
-        socketio.emit('new_temperature_data', {
-            'device_id': data['device_id'],  # Include device_id in the emitted data
-            'temperature': data['temperature'],
-            'humidity': data['humidity']
+        return jsonify({
+            'device_id': device_id,
+            'period': period,
+            'group': group,
+            'start': start.isoformat(),
+            'end': end.isoformat(),
+            'stats': summarize(rows, group),
         })
-        return jsonify({"message": "Data recorded"}), 201
+
+    @temperature_blueprint.route('/get_series_cache_stats')
+    def get_series_cache_stats():
+        return jsonify(_get_series_cache(current_app).stats())
 
     @temperature_blueprint.route('/get_temperature_data')
     def get_temperature_data():
@@ -115,6 +707,35 @@ def create_temperature_blueprint(socketio, db):
             start = end - timedelta(hours=24)
             query = query.filter(TemperatureData.timestamp.between(start, end))
 
+        export_format = request.args.get('format', 'json')
+        if export_format not in EXPORT_FORMATS:
+            return jsonify({"error": "Invalid format"}), 400
+
+        max_points = request.args.get('max_points', type=int)
+        if max_points is not None:
+            if max_points < MIN_MAX_POINTS:
+                return jsonify({"error": f"max_points must be at least {MIN_MAX_POINTS}"}), 400
+            rows = _downsample_rows(list(_iter_rows(device_id, start, end)), max_points)
+            if export_format != 'json':
+                return export_response(export_format, rows, ('temperature', 'humidity'), {'device_id': device_id})
+            return jsonify([
+                {
+                    'device_id': device_id,
+                    'temperature': temperature,
+                    'humidity': humidity,
+                    'timestamp': timestamp.isoformat()
+                }
+                for timestamp, temperature, humidity in rows
+            ])
+
+        if export_format != 'json':
+            return export_response(
+                export_format,
+                _iter_rows(device_id, start, end),
+                ('temperature', 'humidity'),
+                {'device_id': device_id},
+            )
+
         data = query.order_by(TemperatureData.timestamp.asc()).all()
 
         return jsonify([
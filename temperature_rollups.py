@@ -0,0 +1,95 @@
+from datetime import date, timedelta
+from typing import Any, Dict, Iterable, List, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+DAILY_FIELDS = ("temperature", "humidity")
+STATS_PERIODS = {"week": 7, "month": 30, "year": 365}
+STATS_GROUPS = ("day", "week", "month")
+DEFAULT_GROUP = {"week": "day", "month": "day", "year": "month"}
+
+
+def aggregate_daily(readings: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Fold readings into one partial row per device and UTC day."""
+    days: Dict[Tuple[str, date], Dict[str, Any]] = {}
+    for reading in readings:
+        key = (reading["device_id"], reading["timestamp"].date())
+        row = days.get(key)
+        if row is None:
+            row = {"device_id": key[0], "day": key[1], "sample_count": 0}
+            for field in DAILY_FIELDS:
+                row[f"{field}_min"] = reading[field]
+                row[f"{field}_max"] = reading[field]
+                row[f"{field}_sum"] = 0.0
+            days[key] = row
+
+        row["sample_count"] += 1
+        for field in DAILY_FIELDS:
+            value = reading[field]
+            row[f"{field}_min"] = min(row[f"{field}_min"], value)
+            row[f"{field}_max"] = max(row[f"{field}_max"], value)
+            row[f"{field}_sum"] += value
+    return list(days.values())
+
+
+def daily_upsert_statement(table):
+    """INSERT ... ON CONFLICT that merges a partial day into the stored one."""
+    statement = sqlite_insert(table)
+    stored = table.c
+    incoming = statement.excluded
+    merged = {"sample_count": stored.sample_count + incoming.sample_count}
+    for field in DAILY_FIELDS:
+        merged[f"{field}_min"] = func.min(stored[f"{field}_min"], incoming[f"{field}_min"])
+        merged[f"{field}_max"] = func.max(stored[f"{field}_max"], incoming[f"{field}_max"])
+        merged[f"{field}_sum"] = stored[f"{field}_sum"] + incoming[f"{field}_sum"]
+    return statement.on_conflict_do_update(
+        index_elements=[stored.device_id, stored.day], set_=merged
+    )
+
+
+def group_key(day: date, group: str) -> date:
+    """First day of the day, ISO week or month that ``day`` belongs to."""
+    if group == "week":
+        return day - timedelta(days=day.weekday())
+    if group == "month":
+        return day.replace(day=1)
+    return day
+
+
+def summarize(rows: Iterable[Any], group: str) -> List[Dict[str, Any]]:
+    """Combine daily rows (sorted by day) into min/max/avg per group."""
+    groups: Dict[date, Dict[str, Any]] = {}
+    for row in rows:
+        key = group_key(row.day, group)
+        summary = groups.get(key)
+        if summary is None:
+            summary = {"start": key, "days": 0, "sample_count": 0}
+            for field in DAILY_FIELDS:
+                summary[f"{field}_min"] = getattr(row, f"{field}_min")
+                summary[f"{field}_max"] = getattr(row, f"{field}_max")
+                summary[f"{field}_sum"] = 0.0
+            groups[key] = summary
+
+        summary["days"] += 1
+        summary["sample_count"] += row.sample_count
+        for field in DAILY_FIELDS:
+            summary[f"{field}_min"] = min(summary[f"{field}_min"], getattr(row, f"{field}_min"))
+            summary[f"{field}_max"] = max(summary[f"{field}_max"], getattr(row, f"{field}_max"))
+            summary[f"{field}_sum"] += getattr(row, f"{field}_sum")
+
+    results = []
+    for summary in groups.values():
+        result = {
+            "start": summary["start"].isoformat(),
+            "days": summary["days"],
+            "sample_count": summary["sample_count"],
+        }
+        for field in DAILY_FIELDS:
+            result[field] = {
+                "min": summary[f"{field}_min"],
+                "max": summary[f"{field}_max"],
+                "avg": round(summary[f"{field}_sum"] / summary["sample_count"], 2),
+            }
+        results.append(result)
+    return results
@@ -0,0 +1,59 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def temperature_app(tmp_path):
+    from flask import Flask
+    from flask_socketio import SocketIO
+
+    import models  # noqa: F401 - registers every table
+    import temperature
+    from extensions import db
+
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'data.db'}"
+    app.config['INGEST_SPOOL_DIR'] = str(tmp_path / 'spool')
+    app.config['RETENTION_INITIAL_DELAY_SECONDS'] = 3600
+    db.init_app(app)
+    socketio = SocketIO(app, async_mode='threading')
+    with app.app_context():
+        db.create_all()
+    app.register_blueprint(temperature.create_temperature_blueprint(socketio, db))
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def power_app(tmp_path):
+    from flask import Flask
+    from flask_socketio import SocketIO
+
+    import models  # noqa: F401 - registers every table
+    import power
+    from extensions import db
+
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{tmp_path / 'data.db'}"
+    app.config["RETENTION_INITIAL_DELAY_SECONDS"] = 3600
+    app.config["POWER_DEVICES"] = [{"id": "plug", "url": "http://127.0.0.1:9/rpc"}]
+    # Tests read stored rollups only; keep the poller and writer threads off.
+    app.extensions["power_collectors"] = {
+        "started::power_writer": True,
+        "started::power_poller": True,
+    }
+    db.init_app(app)
+    socketio = SocketIO(app, async_mode="threading")
+    with app.app_context():
+        db.create_all()
+    app.register_blueprint(power.create_power_blueprint(socketio, db))
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
@@ -0,0 +1,116 @@
+import threading
+from concurrent.futures import Future
+
+import pytest
+
+from command_dispatcher import CommandDispatcher, coalesce
+
+WAIT_SECONDS = 5
+
+
+@pytest.mark.parametrize(
+    "pending, command, expected",
+    [
+        (None, "toggle", "toggle"),
+        (None, "on", "on"),
+        ("toggle", "off", "off"),
+        ("on", "off", "off"),
+        ("on", "toggle", "off"),
+        ("off", "toggle", "on"),
+        ("toggle", "toggle", None),
+    ],
+)
+def test_coalesce(pending, command, expected):
+    assert coalesce(pending, command) == expected
+
+
+class _BlockingHandler:
+    """Blocks the first command until released and records every one."""
+
+    def __init__(self):
+        self.calls = []
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def __call__(self, session, key, command):
+        self.calls.append((key, command))
+        self.started.set()
+        if not self.release.wait(WAIT_SECONDS):
+            raise AssertionError("handler was never released")
+        return f"{key}:{command}"
+
+
+@pytest.fixture
+def dispatcher():
+    handler = _BlockingHandler()
+    dispatcher = CommandDispatcher(handler, max_workers=2)
+    yield dispatcher, handler
+    handler.release.set()
+    dispatcher.stop()
+
+
+def _submit(dispatcher, key, command):
+    waiter = Future()
+    dispatcher.submit(key, command, waiter)
+    return waiter
+
+
+def test_commands_behind_an_in_flight_send_are_coalesced(dispatcher):
+    dispatcher, handler = dispatcher
+    first = _submit(dispatcher, "led", "on")
+    assert handler.started.wait(WAIT_SECONDS)
+
+    second = _submit(dispatcher, "led", "off")
+    third = _submit(dispatcher, "led", "toggle")
+    assert dispatcher.has_pending("led")
+
+    handler.release.set()
+    assert first.result(WAIT_SECONDS) == "led:on"
+    assert second.result(WAIT_SECONDS) == "led:on"
+    assert third.result(WAIT_SECONDS) == "led:on"
+    assert handler.calls == [("led", "on"), ("led", "on")]
+    stats = dispatcher.stats()["led"]
+    assert stats["sent"] == 2
+    assert stats["coalesced"] == 1
+
+
+def test_cancelled_toggles_resolve_waiters_with_none(dispatcher):
+    dispatcher, handler = dispatcher
+    first = _submit(dispatcher, "led", "on")
+    assert handler.started.wait(WAIT_SECONDS)
+
+    toggles = [_submit(dispatcher, "led", "toggle"), _submit(dispatcher, "led", "toggle")]
+
+    handler.release.set()
+    assert first.result(WAIT_SECONDS) == "led:on"
+    assert [waiter.result(WAIT_SECONDS) for waiter in toggles] == [None, None]
+    assert handler.calls == [("led", "on")]
+    assert not dispatcher.has_pending("led")
+
+
+def test_failed_send_reaches_every_merged_waiter():
+    release = threading.Event()
+    started = threading.Event()
+
+    def handler(session, key, command):
+        started.set()
+        release.wait(WAIT_SECONDS)
+        if command == "off":
+            raise ConnectionError("unreachable")
+        return command
+
+    dispatcher = CommandDispatcher(handler, max_workers=1)
+    try:
+        first = _submit(dispatcher, "led", "on")
+        assert started.wait(WAIT_SECONDS)
+        merged = [_submit(dispatcher, "led", "toggle"), _submit(dispatcher, "led", "off")]
+        release.set()
+
+        assert first.result(WAIT_SECONDS) == "on"
+        for waiter in merged:
+            with pytest.raises(ConnectionError):
+                waiter.result(WAIT_SECONDS)
+        assert dispatcher.stats()["led"]["failures"] == 1
+    finally:
+        release.set()
+        dispatcher.stop()
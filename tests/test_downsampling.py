@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+
+from downsampling import MIN_MAX_POINTS, downsample_indices
+
+
+@pytest.mark.parametrize("max_points", [MIN_MAX_POINTS, 11, 57, 1000])
+def test_budget_is_honoured(max_points):
+    rng = np.random.default_rng(max_points)
+    n = 5000
+    keep = downsample_indices(np.arange(n, dtype=float), rng.normal(size=n), rng.normal(size=n), max_points)
+
+    assert len(keep) <= max_points
+    assert keep[0] == 0 and keep[-1] == n - 1
+    assert np.all(np.diff(keep) > 0)
+
+
+def test_humidity_spike_survives():
+    n = 10000
+    humidity = np.full(n, 50.0)
+    humidity[4321] = 95.0
+    keep = downsample_indices(np.arange(n, dtype=float), np.zeros(n), humidity, 100)
+
+    assert 4321 in keep
+
+
+def test_budget_below_floor_is_rejected():
+    with pytest.raises(ValueError):
+        downsample_indices(np.arange(100.0), np.zeros(100), np.zeros(100), MIN_MAX_POINTS - 1)
+
+
+def test_max_points_below_floor_is_a_bad_request(temperature_app):
+    client = temperature_app.test_client()
+    assert client.get("/get_temperature_data?max_points=3").status_code == 400
+    assert client.get("/get_temperature_series?device_ids=ESP_01&max_points=3").status_code == 400
+    assert client.get(f"/get_temperature_series?device_ids=ESP_01&max_points={MIN_MAX_POINTS}").status_code == 200
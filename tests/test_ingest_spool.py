@@ -0,0 +1,113 @@
+import json
+import os
+import sqlite3
+
+from sqlalchemy.exc import OperationalError
+
+from ingest_spool import (
+    DEAD_LETTER_FILENAME,
+    DRAIN_MAX_BACKOFF_SECONDS,
+    DRAIN_POLL_SECONDS,
+    SPOOL_FILENAME,
+    IngestSpool,
+)
+
+
+def _drain_until_settled(spool, attempts=10):
+    for _ in range(attempts):
+        spool.drain()
+        if not spool.stats()["pending_bytes"]:
+            return
+    raise AssertionError(f"Spool did not settle: {spool.stats()}")
+
+
+def test_bad_line_is_dead_lettered_and_later_lines_are_stored(tmp_path):
+    stored = []
+
+    def handler(batches):
+        readings = [reading for _, batch_readings in batches for reading in batch_readings]
+        # Like the database insert, this fails on an unhashable device_id.
+        {reading["device_id"] for reading in readings}
+        stored.extend(readings)
+
+    spool = IngestSpool(str(tmp_path), handler)
+    spool.append([{"device_id": ["x"], "temperature": 20.0}])
+    spool.append([{"device_id": "ESP_01", "temperature": 21.0}])
+
+    _drain_until_settled(spool)
+
+    assert stored == [{"device_id": "ESP_01", "temperature": 21.0}]
+    stats = spool.stats()
+    assert stats["dead_lettered_lines"] == 1
+    assert stats["drained"] == 1
+    with open(os.path.join(str(tmp_path), DEAD_LETTER_FILENAME)) as dead_letters:
+        lines = [json.loads(line) for line in dead_letters]
+    assert [line["readings"][0]["device_id"] for line in lines] == [["x"]]
+
+    # Nothing is left to replay after a restart.
+    spool.append([{"device_id": "ESP_02", "temperature": 22.0}])
+    restarted = IngestSpool(str(tmp_path), handler)
+    _drain_until_settled(restarted)
+    assert [reading["device_id"] for reading in stored] == ["ESP_01", "ESP_02"]
+
+
+def test_database_outage_is_retried_without_dead_lettering(tmp_path):
+    stored = []
+    outage = [
+        OperationalError("INSERT", {}, sqlite3.OperationalError("database is locked"))
+        for _ in range(12)
+    ]
+
+    def handler(batches):
+        if outage:
+            raise outage.pop()
+        stored.extend(reading for _, batch_readings in batches for reading in batch_readings)
+
+    spool = IngestSpool(str(tmp_path), handler)
+    for index in range(5):
+        spool.append([{"device_id": f"ESP_{index}"}])
+
+    delays = []
+    for _ in range(12):
+        assert spool.drain() == 0
+        delays.append(spool.retry_delay())
+    assert delays == sorted(delays)
+    assert delays[-1] == DRAIN_MAX_BACKOFF_SECONDS
+    assert spool.stats()["consecutive_failures"] == 12
+
+    assert spool.drain() == 5
+    assert [reading["device_id"] for reading in stored] == [f"ESP_{index}" for index in range(5)]
+    stats = spool.stats()
+    assert stats["dead_lettered_lines"] == 0
+    assert stats["failed_drains"] == 12
+    assert stats["consecutive_failures"] == 0
+    assert spool.retry_delay() == DRAIN_POLL_SECONDS
+    assert not os.path.exists(os.path.join(str(tmp_path), DEAD_LETTER_FILENAME))
+
+
+def test_unreadable_line_is_dead_lettered(tmp_path):
+    stored = []
+    spool = IngestSpool(str(tmp_path), lambda batches: stored.extend(batches))
+    spool.append([{"device_id": "ESP_01"}])
+    with open(os.path.join(str(tmp_path), SPOOL_FILENAME), "a") as spool_file:
+        spool_file.write("{not json\n")
+    spool.append([{"device_id": "ESP_02"}])
+
+    _drain_until_settled(spool)
+
+    assert [readings[0]["device_id"] for _, readings in stored] == ["ESP_01", "ESP_02"]
+    assert spool.stats()["dead_lettered_lines"] == 1
+    with open(os.path.join(str(tmp_path), DEAD_LETTER_FILENAME)) as dead_letters:
+        assert dead_letters.read() == "{not json\n"
+
+
+def test_lines_carry_a_batch_id(tmp_path):
+    received = []
+    spool = IngestSpool(str(tmp_path), received.extend)
+    spool.append([{"device_id": "ESP_01"}])
+    spool.append([{"device_id": "ESP_02"}])
+    spool.drain()
+
+    batch_ids = [batch_id for batch_id, _ in received]
+    assert all(batch_ids) and len(set(batch_ids)) == 2
+    assert [readings for _, readings in received] == [[{"device_id": "ESP_01"}], [{"device_id": "ESP_02"}]]
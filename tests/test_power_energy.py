@@ -0,0 +1,95 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from models import PowerRollup
+from power_energy import consumption_per_bucket, hourly_consumption
+from power_rollups import ROLLUP_RESOLUTIONS
+
+
+def _hours(*values):
+    return np.array(values, dtype="datetime64[h]")
+
+
+def test_counter_reset_counts_everything_since_the_reset():
+    hours, per_hour, estimated = hourly_consumption(
+        _hours("2024-03-01T00", "2024-03-01T01", "2024-03-01T02"), [100.0, 150.0, 20.0]
+    )
+
+    assert hours.tolist() == _hours("2024-03-01T01", "2024-03-01T02").tolist()
+    assert per_hour.tolist() == [50.0, 20.0]
+    assert estimated.tolist() == [False, False]
+
+
+def test_multi_hour_gap_is_spread_and_marked_estimated():
+    hours, per_hour, estimated = hourly_consumption(
+        _hours("2024-03-01T00", "2024-03-01T01", "2024-03-01T04"), [100.0, 110.0, 170.0]
+    )
+
+    assert hours.tolist() == _hours(
+        "2024-03-01T01", "2024-03-01T02", "2024-03-01T03", "2024-03-01T04"
+    ).tolist()
+    assert per_hour.tolist() == [10.0, 20.0, 20.0, 20.0]
+    assert estimated.tolist() == [False, True, True, True]
+
+
+def test_single_reading_has_no_consumption():
+    hours, per_hour, estimated = hourly_consumption(_hours("2024-03-01T00"), [100.0])
+
+    assert len(hours) == len(per_hour) == len(estimated) == 0
+
+
+def test_gap_across_midnight_is_split_between_days():
+    starts, totals, estimated = consumption_per_bucket(
+        _hours("2024-03-01T21", "2024-03-01T22", "2024-03-02T02"), [0.0, 5.0, 45.0], "day"
+    )
+
+    assert starts.tolist() == np.array(["2024-03-01", "2024-03-02"], dtype="datetime64[D]").tolist()
+    assert totals.tolist() == [15.0, 30.0]
+    assert estimated.tolist() == [True, True]
+
+
+def _store_counters(app, first_hour, counters):
+    from extensions import db
+
+    with app.app_context():
+        for offset, counter in enumerate(counters):
+            db.session.add(
+                PowerRollup(
+                    device_id="plug",
+                    resolution=ROLLUP_RESOLUTIONS["1h"],
+                    bucket_start=first_hour + timedelta(hours=offset),
+                    sample_count=1,
+                    energy_last=counter,
+                )
+            )
+        db.session.commit()
+
+
+def _day_totals(app):
+    response = app.test_client().get(
+        "/power/energy?device_id=plug&bucket=day&start=2024-03-01T00:00:00&end=2024-03-02T00:00:00"
+    )
+    assert response.status_code == 200
+    return [(bucket["start"], bucket["energy_wh"]) for bucket in response.get_json()["buckets"]]
+
+
+def test_day_is_not_cached_while_readings_end_mid_day(power_app):
+    # Readings stop at noon, e.g. while the plug was unreachable.
+    _store_counters(power_app, datetime(2024, 3, 1), [10.0 * hour for hour in range(13)])
+    assert _day_totals(power_app) == [("2024-03-01T00:00:00+00:00", 120.0)]
+
+    # The rest of the day arrives later and must show up in the same bucket.
+    _store_counters(power_app, datetime(2024, 3, 1, 13), [120.0 + 10.0 * hour for hour in range(1, 12)])
+    assert _day_totals(power_app) == [("2024-03-01T00:00:00+00:00", 230.0)]
+
+    # Once the day is fully covered it is final and served from the cache,
+    # so rewriting a stored counter no longer changes it.
+    _store_counters(power_app, datetime(2024, 3, 2), [240.0])
+    assert _day_totals(power_app) == [("2024-03-01T00:00:00+00:00", 230.0)]
+    with power_app.app_context():
+        from extensions import db
+
+        PowerRollup.query.filter_by(bucket_start=datetime(2024, 3, 1, 6)).update({"energy_last": 0.0})
+        db.session.commit()
+    assert _day_totals(power_app) == [("2024-03-01T00:00:00+00:00", 230.0)]
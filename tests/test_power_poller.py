@@ -0,0 +1,121 @@
+import pytest
+
+from power_poller import DEFAULT_ADAPTIVE, PowerPoller
+
+
+class _Response:
+    def __init__(self, payload):
+        self._payload = payload
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self._payload
+
+
+class _Session:
+    """Answers each poll with the next power value, or fails for ``None``."""
+
+    def __init__(self):
+        self.power = None
+
+    def get(self, url, timeout=None):
+        if self.power is None:
+            raise ConnectionError("unreachable")
+        return _Response({"apower": self.power})
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def poller():
+    poller = PowerPoller(
+        [{"id": "plug", "url": "http://10.0.0.9/rpc/Switch.GetStatus?id=0"}],
+        on_sample=lambda device, payload: None,
+        power_of=lambda payload: payload.get("apower"),
+        default_interval=1.0,
+        request_timeout=1.0,
+    )
+    state = poller._devices["plug"]
+    state.session = _Session()
+    yield poller, state
+    poller.stop()
+
+
+def _poll(poller, state, power):
+    state.session.power = power
+    state.in_flight = True
+    poller._poll(state)
+    assert not state.in_flight
+
+
+def test_unreachable_plug_backs_off_up_to_the_cap(poller):
+    poller, state = poller
+    intervals = []
+    for _ in range(12):
+        _poll(poller, state, None)
+        intervals.append(state.interval)
+
+    assert intervals[:4] == [2.0, 4.0, 8.0, 16.0]
+    assert intervals[-1] == DEFAULT_ADAPTIVE["max_backoff_seconds"]
+    assert poller.stats()["plug"]["state"] == "backoff"
+
+
+def test_backoff_stays_finite_after_days_offline(poller):
+    poller, state = poller
+    state.consecutive_failures = 5000
+
+    _poll(poller, state, None)
+
+    assert state.consecutive_failures == 5001
+    assert state.interval == DEFAULT_ADAPTIVE["max_backoff_seconds"]
+
+
+def test_reachable_plug_returns_to_base_rate(poller):
+    poller, state = poller
+    for _ in range(5):
+        _poll(poller, state, None)
+
+    _poll(poller, state, 100.0)
+
+    assert state.consecutive_failures == 0
+    assert state.interval == state.base_interval
+    assert poller.stats()["plug"]["state"] == "active"
+
+
+def test_stable_power_slows_down_and_a_change_resets(poller):
+    poller, state = poller
+    after = DEFAULT_ADAPTIVE["stable_after_polls"]
+    factor = DEFAULT_ADAPTIVE["stable_slowdown_factor"]
+
+    _poll(poller, state, 100.0)
+    for _ in range(after):
+        _poll(poller, state, 100.5)
+    assert state.interval == pytest.approx(state.base_interval * factor)
+    assert poller.stats()["plug"]["state"] == "stable"
+
+    for _ in range(after * 10):
+        _poll(poller, state, 100.0)
+    assert state.interval == DEFAULT_ADAPTIVE["max_stable_interval"]
+
+    _poll(poller, state, 250.0)
+    assert state.interval == state.base_interval
+
+
+def test_device_is_released_when_the_state_update_fails(poller):
+    poller, state = poller
+
+    class FailingLogger:
+        def warning(self, *args):
+            raise RuntimeError("logging failed")
+
+    poller._logger = FailingLogger()
+    state.session.power = None
+    state.in_flight = True
+    with pytest.raises(RuntimeError):
+        poller._poll(state)
+
+    assert not state.in_flight
+    assert state.next_due > 0
@@ -0,0 +1,67 @@
+from datetime import date, datetime, timedelta
+
+from series_cache import DaySeriesCache, SeriesColumns, merge_ranges
+
+DAY = date(2024, 3, 1)
+ROWS = SeriesColumns.from_rows([(datetime(2024, 3, 1, 12), 20.0, 50.0)])
+
+
+def test_put_after_invalidation_is_refused():
+    cache = DaySeriesCache()
+    generation = cache.generation("ESP_01", DAY)
+    # A late batch commits and invalidates the day while the reader queries it.
+    cache.invalidate("ESP_01", DAY)
+
+    assert not cache.put("ESP_01", DAY, ROWS, generation)
+    assert cache.get("ESP_01", DAY) is None
+    assert cache.stats()["stale_puts"] == 1
+
+    assert cache.put("ESP_01", DAY, ROWS, cache.generation("ESP_01", DAY))
+    assert cache.get("ESP_01", DAY) is ROWS
+
+
+def test_invalidation_only_affects_its_own_day():
+    cache = DaySeriesCache()
+    generation = cache.generation("ESP_01", DAY)
+    cache.invalidate("ESP_02", DAY)
+    cache.invalidate("ESP_01", date(2024, 3, 2))
+
+    assert cache.put("ESP_01", DAY, ROWS, generation)
+
+
+def test_merge_ranges_joins_adjacent_segments():
+    first, second, third, fourth = (datetime(2024, 3, day) for day in (1, 2, 3, 5))
+    assert merge_ranges([(second, third), (first, second), (fourth, datetime(2024, 3, 6))]) == [
+        (first, third),
+        (fourth, datetime(2024, 3, 6)),
+    ]
+
+
+def _day(day, count):
+    start = datetime(2024, 3, day)
+    return SeriesColumns.from_rows([(start + timedelta(minutes=minute), 20.0, 50.0) for minute in range(count)])
+
+
+def test_cache_is_bounded_by_rows():
+    cache = DaySeriesCache(max_rows=100)
+    for day in range(1, 6):
+        assert cache.put("ESP_01", date(2024, 3, day), _day(day, 40))
+
+    stats = cache.stats()
+    assert stats["rows"] == 80
+    assert stats["bytes"] == 80 * 24
+    assert cache.get("ESP_01", date(2024, 3, 3)) is None
+    assert len(cache.get("ESP_01", date(2024, 3, 5))) == 40
+
+    # A day larger than the whole cache is not stored.
+    assert not cache.put("ESP_02", DAY, _day(1, 101))
+
+
+def test_columns_round_trip_and_split():
+    rows = [(datetime(2024, 3, 1, hour, 30), 20.0 + hour, 50.5) for hour in range(24)]
+    columns = SeriesColumns.from_rows(rows)
+
+    assert list(columns.rows()) == rows
+    morning = columns.between(datetime(2024, 3, 1, 6), datetime(2024, 3, 1, 12))
+    assert [row[0].hour for row in morning.rows()] == [6, 7, 8, 9, 10, 11]
+    assert len(SeriesColumns.concatenate([morning, columns.between(datetime(2024, 3, 2), datetime(2024, 3, 3))])) == 6
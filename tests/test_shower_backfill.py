@@ -0,0 +1,147 @@
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+from shower_backfill import detect_events
+from shower_detection import ShowerDetector
+
+BASE = datetime(2024, 1, 1)
+THRESHOLD = 75.0
+
+
+def _times(count, offset=0):
+    return [BASE + timedelta(minutes=offset + index) for index in range(count)]
+
+
+def _chunks(timestamps, humidity, sizes):
+    chunks, position = [], 0
+    for size in sizes:
+        chunks.append((timestamps[position:position + size], humidity[position:position + size]))
+        position += size
+    chunks.append((timestamps[position:], humidity[position:]))
+    return chunks
+
+
+def _live_events(timestamps, humidity, samples, preceding=(), open_start=None):
+    """Events the live detector produces for the same readings."""
+    detector = ShowerDetector(THRESHOLD, samples)
+    detector.seed(preceding, 1 if open_start else None)
+    events, current = [], open_start
+    for timestamp, value in zip(timestamps, humidity):
+        transition = detector.evaluate(timestamp, value)
+        if transition and transition[0] == "start":
+            current = transition[1]
+        elif transition and transition[0] == "end":
+            events.append((current, transition[1]))
+            current = None
+        detector.accept(timestamp, value, transition, 1)
+    return events + ([(current, None)] if current else [])
+
+
+def test_leading_and_trailing_runs():
+    humidity = [90, 90, 90, 50, 50, 50, 90, 90, 90]
+    timestamps = _times(len(humidity))
+
+    events = detect_events([(timestamps, humidity)], THRESHOLD, 3)
+
+    assert events == [(timestamps[0], timestamps[5]), (timestamps[6], None)]
+
+
+def test_short_runs_do_not_trigger():
+    humidity = [90, 90, 50, 90, 90, 50, 50, 90]
+    assert detect_events([(_times(len(humidity)), humidity)], THRESHOLD, 3) == []
+
+
+@pytest.mark.parametrize("sizes", [[1] * 12, [2, 2, 2], [4, 1], [5], [0, 3, 0, 7]])
+def test_runs_across_chunk_boundaries(sizes):
+    humidity = [50, 50, 90, 90, 90, 90, 50, 50, 50, 50, 90, 90]
+    timestamps = _times(len(humidity))
+
+    events = detect_events(_chunks(timestamps, humidity, sizes), THRESHOLD, 3)
+
+    assert events == [(timestamps[2], timestamps[8])]
+
+
+def test_preceding_readings_complete_a_run():
+    preceding = (_times(2, offset=-2), [90, 90])
+    humidity = [90, 50, 50, 50]
+    timestamps = _times(len(humidity))
+
+    events = detect_events([(timestamps, humidity)], THRESHOLD, 3, preceding=preceding)
+
+    assert events == [(preceding[0][0], timestamps[3])]
+
+
+def test_open_shower_is_closed():
+    open_start = BASE - timedelta(hours=1)
+    humidity = [90, 50, 50, 50, 90]
+    timestamps = _times(len(humidity))
+
+    events = detect_events([(timestamps, humidity)], THRESHOLD, 3, open_start=open_start)
+
+    assert events == [(open_start, timestamps[3])]
+
+
+def test_stop_after_reads_only_until_the_last_event_closes():
+    humidity = [90, 90, 90, 50, 50, 50] + [90, 90, 90, 50, 50, 50]
+    timestamps = _times(len(humidity))
+    chunks = _chunks(timestamps, humidity, [2, 2, 2, 2, 2])
+    read = []
+
+    def tracked():
+        for chunk in chunks:
+            read.append(chunk)
+            yield chunk
+
+    events = detect_events(tracked(), THRESHOLD, 3, stop_after=timestamps[1])
+
+    assert events == [(timestamps[0], timestamps[5])]
+    assert len(read) == 3
+
+
+def test_matches_live_detector_for_any_chunking():
+    rng = random.Random(20240101)
+    for _ in range(2000):
+        samples = rng.randint(1, 5)
+        count = rng.randint(0, 60)
+        humidity = [rng.choice((50.0, 90.0, THRESHOLD)) for _ in range(count)]
+        timestamps = _times(count)
+        preceding_count = rng.randint(0, samples)
+        preceding = (
+            _times(preceding_count, offset=-preceding_count),
+            [rng.choice((50.0, 90.0)) for _ in range(preceding_count)],
+        )
+        open_start = BASE - timedelta(hours=1) if rng.random() < 0.3 else None
+        sizes = [rng.randint(0, 8) for _ in range(rng.randint(0, 10))]
+
+        expected = _live_events(
+            timestamps, humidity, samples, list(zip(*preceding)), open_start
+        )
+        actual = detect_events(
+            _chunks(timestamps, humidity, sizes),
+            THRESHOLD,
+            samples,
+            open_start=open_start,
+            preceding=preceding,
+        )
+        assert actual == expected, (samples, humidity, preceding, open_start, sizes)
+
+
+def test_stop_after_keeps_every_event_that_starts_before_it():
+    rng = random.Random(7)
+    for _ in range(1000):
+        samples = rng.randint(1, 5)
+        count = rng.randint(1, 60)
+        humidity = [rng.choice((50.0, 90.0)) for _ in range(count)]
+        timestamps = _times(count)
+        stop_after = timestamps[rng.randrange(count)]
+        sizes = [rng.randint(1, 8) for _ in range(rng.randint(0, 10))]
+
+        full = detect_events(_chunks(timestamps, humidity, sizes), THRESHOLD, samples)
+        stopped = detect_events(
+            _chunks(timestamps, humidity, sizes), THRESHOLD, samples, stop_after=stop_after
+        )
+        assert [event for event in stopped if event[0] < stop_after] == [
+            event for event in full if event[0] < stop_after
+        ], (samples, humidity, stop_after, sizes)
@@ -0,0 +1,135 @@
+from models import TemperatureData
+
+
+def _drain_until_settled(app, attempts=10):
+    spool = app.extensions['temperature_ingest_spool']
+    with app.app_context():
+        for _ in range(attempts):
+            spool.drain()
+            if not spool.stats()['pending_bytes']:
+                return spool
+    raise AssertionError(f"Spool did not settle: {spool.stats()}")
+
+
+def _stored_device_ids(app):
+    with app.app_context():
+        return [row.device_id for row in TemperatureData.query.order_by(TemperatureData.timestamp).all()]
+
+
+def test_bad_spooled_batch_does_not_block_later_readings(temperature_app):
+    spool = temperature_app.extensions['temperature_ingest_spool']
+    spool.append([
+        {'device_id': ['x'], 'temperature': 20.0, 'humidity': 50.0, 'timestamp': '2024-01-01T00:00:00'},
+    ])
+    response = temperature_app.test_client().post('/record_temperature_batch', json={
+        'device_id': 'ESP_01',
+        'readings': [{'temperature': 21.0, 'humidity': 40.0}],
+    })
+    assert response.status_code == 202
+
+    spool = _drain_until_settled(temperature_app)
+
+    assert _stored_device_ids(temperature_app) == ['ESP_01']
+    assert spool.stats()['dead_lettered_lines'] == 1
+
+
+def test_batch_with_invalid_readings_is_rejected(temperature_app):
+    client = temperature_app.test_client()
+    invalid = [
+        {'device_id': ['x'], 'temperature': 20.0, 'humidity': 50.0},
+        {'device_id': {'id': 'x'}, 'temperature': 20.0, 'humidity': 50.0},
+        {'device_id': 'ESP_01', 'temperature': 20.0, 'humidity': 50.0, 'timestamp': '2999-01-01T00:00:00'},
+        {'device_id': 'ESP_01', 'temperature': 20.0, 'humidity': 50.0, 'timestamp': 0},
+        {'device_id': 'ESP_01', 'temperature': 20.0, 'humidity': 50.0, 'age_seconds': -60},
+        {'device_id': 'ESP_01', 'temperature': 'nan', 'humidity': 50.0},
+    ]
+    for reading in invalid:
+        response = client.post('/record_temperature_batch', json=[reading])
+        assert response.status_code == 400, reading
+
+    response = client.post('/record_temperature_batch', json=[
+        {'device_id': 'ESP_01', 'temperature': 20.0, 'humidity': 50.0, 'age_seconds': 120},
+    ])
+    assert response.status_code == 202
+    _drain_until_settled(temperature_app)
+    assert _stored_device_ids(temperature_app) == ['ESP_01']
+
+
+def test_replayed_spool_line_is_stored_once(temperature_app, monkeypatch):
+    from models import TemperatureDaily
+
+    spool = temperature_app.extensions['temperature_ingest_spool']
+    store_offset = spool._store_offset
+    crashes = []
+
+    def crash_before_offset(offset):
+        # The first drain commits but dies before the offset is saved.
+        monkeypatch.setattr(spool, '_store_offset', store_offset)
+        crashes.append(offset)
+        raise RuntimeError('crashed after the commit')
+
+    monkeypatch.setattr(spool, '_store_offset', crash_before_offset)
+    response = temperature_app.test_client().post('/record_temperature_batch', json={
+        'device_id': 'ESP_01',
+        'readings': [{'temperature': 21.0, 'humidity': 40.0}, {'temperature': 22.0, 'humidity': 41.0}],
+    })
+    assert response.status_code == 202
+
+    with temperature_app.app_context():
+        try:
+            spool.drain()
+        except RuntimeError:
+            pass
+    _drain_until_settled(temperature_app)
+
+    assert crashes
+    assert _stored_device_ids(temperature_app) == ['ESP_01', 'ESP_01']
+    with temperature_app.app_context():
+        daily = TemperatureDaily.query.one()
+    assert daily.sample_count == 2
+    assert daily.temperature_sum == 43.0
+
+
+def test_series_reads_only_uncached_segments(temperature_app):
+    from datetime import datetime, timedelta
+
+    from sqlalchemy import event
+
+    from extensions import db
+
+    first = datetime(2024, 3, 1)
+    with temperature_app.app_context():
+        db.session.execute(TemperatureData.__table__.insert(), [
+            {'device_id': 'ESP_01', 'temperature': 20.0 + hour % 5, 'humidity': 50.0,
+             'timestamp': first + timedelta(hours=hour)}
+            for hour in range(5 * 24)
+        ])
+        db.session.commit()
+        engine = db.engine
+
+    client = temperature_app.test_client()
+    url = '/get_temperature_series?device_ids=ESP_01&start=2024-03-01T12:00:00&end=2024-03-05T06:00:00'
+    cold = client.get(url).get_json()
+
+    ranges = []
+
+    def record_range(conn, cursor, statement, parameters, context, executemany):
+        if 'FROM temperature_data' in statement:
+            ranges.append(tuple(parameters[1:3]))
+
+    event.listen(engine, 'before_cursor_execute', record_range)
+    try:
+        warm = client.get(url).get_json()
+    finally:
+        event.remove(engine, 'before_cursor_execute', record_range)
+
+    timestamps = [row['timestamp'] for row in cold['series']['ESP_01']]
+    assert timestamps[0] == '2024-03-01T12:00:00'
+    assert timestamps[-1] == '2024-03-05T05:00:00'
+    assert len(timestamps) == 12 + 3 * 24 + 6
+    assert warm == cold
+    # The three complete days come from the cache; only the partial ends are read.
+    assert ranges == [
+        ('2024-03-01 12:00:00.000000', '2024-03-02 00:00:00.000000'),
+        ('2024-03-05 00:00:00.000000', '2024-03-05 06:00:00.000000'),
+    ]
@@ -0,0 +1,86 @@
+import json
+import struct
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Iterator, Optional, Sequence
+
+import numpy as np
+from flask import Response, stream_with_context
+
+EXPORT_FORMATS = ("json", "binary", "jsonl")
+BINARY_MAGIC = b"SHTS"
+BINARY_VERSION = 1
+CHUNK_ROWS = 1000
+
+
+def epoch_ms(timestamp: datetime) -> int:
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    return int(timestamp.timestamp() * 1000)
+
+
+def _binary_header(columns: Sequence[str]) -> bytes:
+    header = [BINARY_MAGIC, struct.pack("<HH", BINARY_VERSION, len(columns))]
+    for column in columns:
+        encoded = column.encode("utf-8")
+        header.append(struct.pack("<B", len(encoded)) + encoded)
+    return b"".join(header)
+
+
+def _binary_chunk(rows: Sequence[Sequence[Any]], column_count: int) -> bytes:
+    timestamps = np.fromiter((epoch_ms(row[0]) for row in rows), dtype="<i8", count=len(rows))
+    parts = [struct.pack("<I", len(rows)), timestamps.tobytes()]
+    for index in range(1, column_count + 1):
+        values = np.fromiter(
+            (np.nan if row[index] is None else row[index] for row in rows),
+            dtype="<f4",
+            count=len(rows),
+        )
+        parts.append(values.tobytes())
+    return b"".join(parts)
+
+
+def iter_binary(rows: Iterable[Sequence[Any]], columns: Sequence[str], chunk_rows: int = CHUNK_ROWS) -> Iterator[bytes]:
+    """Encode ``(timestamp, *values)`` rows as length-prefixed columnar blocks.
+
+    Layout (all little-endian): ``SHTS``, u16 version, u16 column count, then
+    per column a u8 length and UTF-8 name. Each block is a u32 row count,
+    that many i64 epoch-ms timestamps, then one f32 array per column
+    (missing values are NaN). A block with a row count of 0 ends the stream.
+    """
+    yield _binary_header(columns)
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_rows:
+            yield _binary_chunk(chunk, len(columns))
+            chunk = []
+    if chunk:
+        yield _binary_chunk(chunk, len(columns))
+    yield struct.pack("<I", 0)
+
+
+def iter_jsonl(
+    rows: Iterable[Sequence[Any]], columns: Sequence[str], extra: Optional[Dict[str, Any]] = None
+) -> Iterator[str]:
+    for row in rows:
+        timestamp = row[0]
+        if timestamp.tzinfo is None:
+            timestamp = timestamp.replace(tzinfo=timezone.utc)
+        record = dict(extra or {})
+        record.update(zip(columns, row[1:]))
+        record["timestamp"] = timestamp.isoformat()
+        yield json.dumps(record) + "\n"
+
+
+def export_response(export_format: str, rows: Iterable[Sequence[Any]], columns: Sequence[str], extra=None) -> Response:
+    """Stream rows straight from the cursor in the requested non-JSON format."""
+    if export_format == "binary":
+        response = Response(
+            stream_with_context(iter_binary(rows, columns)), mimetype="application/octet-stream"
+        )
+    else:
+        response = Response(
+            stream_with_context(iter_jsonl(rows, columns, extra)), mimetype="application/x-ndjson"
+        )
+    response.headers["X-Timeseries-Columns"] = ",".join(columns)
+    return response
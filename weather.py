@@ -0,0 +1,218 @@
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+import requests
+from requests.exceptions import RequestException
+
+FORECAST_URL = "https://api.open-meteo.com/v1/forecast"
+WEATHER_REFRESH_SECONDS = 600
+WEATHER_RETRY_SECONDS = 60
+WEATHER_TIMEOUT_SECONDS = 5
+WEATHER_TIMEZONE = "Europe/Berlin"
+# Reports older than this many refresh intervals are marked as stale.
+STALE_AFTER_INTERVALS = 2
+
+
+def weather_summary(code):
+    if code is None:
+        return {"symbol": "—", "label": "Keine Daten"}
+    if code == 0:
+        return {"symbol": "☀️", "label": "Klar"}
+    if code in {1, 2}:
+        return {"symbol": "🌤️", "label": "Leicht bewölkt"}
+    if code == 3:
+        return {"symbol": "☁️", "label": "Bewölkt"}
+    if code in {45, 48}:
+        return {"symbol": "🌫️", "label": "Nebel"}
+    if 51 <= code <= 57:
+        return {"symbol": "🌦️", "label": "Nieselregen"}
+    if 61 <= code <= 67:
+        return {"symbol": "🌧️", "label": "Regen"}
+    if 71 <= code <= 77:
+        return {"symbol": "🌨️", "label": "Schnee"}
+    if 80 <= code <= 82:
+        return {"symbol": "🌦️", "label": "Schauer"}
+    if 85 <= code <= 86:
+        return {"symbol": "🌨️", "label": "Schneeschauer"}
+    if code in {95, 96, 99}:
+        return {"symbol": "⛈️", "label": "Gewitter"}
+    return {"symbol": "—", "label": "Unbekannt"}
+
+
+def _report_from_payload(name: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+    current = payload.get("current", {})
+    daily = payload.get("daily", {})
+    summary = weather_summary(current.get("weather_code"))
+    return {
+        "location": name,
+        "temperature": current.get("temperature_2m"),
+        "humidity": current.get("relative_humidity_2m"),
+        "weather_code": current.get("weather_code"),
+        "symbol": summary["symbol"],
+        "condition": summary["label"],
+        "forecast_max": (daily.get("temperature_2m_max") or [None])[0],
+        "forecast_min": (daily.get("temperature_2m_min") or [None])[0],
+        "precipitation_probability": (daily.get("precipitation_probability_max") or [None])[0],
+    }
+
+
+def _empty_report(name: str, error: str) -> Dict[str, Any]:
+    return {
+        "location": name,
+        "temperature": None,
+        "humidity": None,
+        "weather_code": None,
+        "symbol": "—",
+        "condition": "Keine Daten",
+        "forecast_max": None,
+        "forecast_min": None,
+        "precipitation_probability": None,
+        "error": error,
+    }
+
+
+class WeatherCache:
+    """Keeps the dashboard weather in memory and refreshes it in the background.
+
+    All locations are fetched with one multi-location open-meteo request.
+    Readers never touch the network: they get the last successful reports
+    with the time they were fetched, flagged as stale when refreshes have
+    been failing for a while.
+    """
+
+    def __init__(
+        self,
+        locations: Dict[str, Dict[str, float]],
+        refresh_seconds: float = WEATHER_REFRESH_SECONDS,
+        retry_seconds: float = WEATHER_RETRY_SECONDS,
+        timeout: float = WEATHER_TIMEOUT_SECONDS,
+        timezone: str = WEATHER_TIMEZONE,
+        sleep: Callable[[float], None] = time.sleep,
+        logger=None,
+    ):
+        self._locations = locations
+        self._refresh_seconds = refresh_seconds
+        self._retry_seconds = min(retry_seconds, refresh_seconds)
+        self._timeout = timeout
+        self._timezone = timezone
+        self._sleep = sleep
+        self._logger = logger
+        self._session = requests.Session()
+        self._lock = threading.Lock()
+        self._reports: Dict[str, Dict[str, Any]] = {}
+        self._updated_at: Optional[float] = None
+        self._last_error: Optional[str] = None
+        self._refreshes = 0
+        self._failures = 0
+
+    def refresh(self) -> bool:
+        if not self._locations:
+            return True
+        names = list(self._locations)
+        try:
+            response = self._session.get(
+                FORECAST_URL,
+                params={
+                    "latitude": ",".join(str(self._locations[name]["latitude"]) for name in names),
+                    "longitude": ",".join(str(self._locations[name]["longitude"]) for name in names),
+                    "current": "temperature_2m,relative_humidity_2m,weather_code",
+                    "daily": "temperature_2m_max,temperature_2m_min,precipitation_probability_max,weather_code",
+                    "forecast_days": 1,
+                    "timezone": self._timezone,
+                },
+                timeout=self._timeout,
+            )
+            response.raise_for_status()
+            payload = response.json()
+            # A single location is answered with an object, several with a list.
+            payloads = payload if isinstance(payload, list) else [payload]
+            reports = {
+                name: _report_from_payload(name, location_payload)
+                for name, location_payload in zip(names, payloads)
+            }
+        except (RequestException, ValueError, KeyError, TypeError) as exc:
+            with self._lock:
+                self._failures += 1
+                self._last_error = str(exc)
+            if self._logger:
+                self._logger.warning("Weather refresh failed: %s", exc)
+            return False
+
+        with self._lock:
+            self._reports = reports
+            self._updated_at = time.time()
+            self._last_error = None
+            self._refreshes += 1
+        return True
+
+    def run(self):
+        while True:
+            succeeded = self.refresh()
+            self._sleep(self._refresh_seconds if succeeded else self._retry_seconds)
+
+    def reports(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            reports, updated_at = self._reports, self._updated_at
+            pending = updated_at is None and self._last_error is None
+
+        if updated_at is None:
+            error = "Wetterdaten werden geladen" if pending else "Wetterdaten konnten nicht geladen werden"
+            return [_empty_report(name, error) for name in self._locations]
+
+        stale = time.time() - updated_at > self._refresh_seconds * STALE_AFTER_INTERVALS
+        fetched_at = datetime.fromtimestamp(updated_at).isoformat(timespec="seconds")
+        return [
+            {
+                **reports.get(name, _empty_report(name, "Wetterdaten konnten nicht geladen werden")),
+                "updated_at": fetched_at,
+                "stale": stale,
+            }
+            for name in self._locations
+        ]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "locations": len(self._locations),
+                "updated_at": self._updated_at,
+                "age_seconds": round(time.time() - self._updated_at, 1) if self._updated_at else None,
+                "refreshes": self._refreshes,
+                "failures": self._failures,
+                "last_error": self._last_error,
+            }
+
+
+def _parse_locations(config: Dict[str, Any]) -> Dict[str, Dict[str, float]]:
+    locations = {}
+    for name, coords in (config.get("locations") or {}).items():
+        try:
+            locations[name] = {
+                "latitude": float(coords["latitude"]),
+                "longitude": float(coords["longitude"]),
+            }
+        except (KeyError, TypeError, ValueError):
+            continue
+    return locations
+
+
+def get_weather_cache(app, socketio, config: Optional[Dict[str, Any]] = None) -> WeatherCache:
+    """Return the app-wide weather cache, starting its refresh task on first use.
+
+    ``config`` is the ``weather`` section of ``config.yaml``.
+    """
+    cache = app.extensions.get("weather")
+    if cache is None:
+        config = config or {}
+        cache = WeatherCache(
+            _parse_locations(config),
+            refresh_seconds=float(config.get("refresh_seconds", WEATHER_REFRESH_SECONDS)),
+            timeout=float(config.get("timeout_seconds", WEATHER_TIMEOUT_SECONDS)),
+            timezone=config.get("timezone", WEATHER_TIMEZONE),
+            sleep=socketio.sleep,
+            logger=app.logger,
+        )
+        app.extensions["weather"] = cache
+        socketio.start_background_task(cache.run)
+    return cache
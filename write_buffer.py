@@ -0,0 +1,147 @@
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+
+class WriteBehindBuffer:
+    """Collects rows from many producers and writes them in bulk.
+
+    Producers call ``put`` and never touch the database. A single flusher
+    task drains the bounded queue once per ``flush_interval`` seconds, or
+    earlier when ``batch_size`` rows are waiting, and hands each batch to
+    ``write_rows`` inside one transaction.
+    """
+
+    def __init__(
+        self,
+        db,
+        write_rows: Callable[[List[Dict[str, Any]]], None],
+        batch_size: int = 200,
+        flush_interval: float = 1.0,
+        max_queue_size: int = 10000,
+        logger=None,
+    ):
+        self._db = db
+        self._write_rows = write_rows
+        self.batch_size = max(int(batch_size), 1)
+        self.flush_interval = max(float(flush_interval), 0.01)
+        self._queue: "queue.Queue[Dict[str, Any]]" = queue.Queue(maxsize=max(int(max_queue_size), 1))
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._flush_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._logger = logger
+        self._stats = {
+            "enqueued": 0,
+            "dropped": 0,
+            "written": 0,
+            "flushes": 0,
+            "failed_flushes": 0,
+            "queue_high_water": 0,
+            "last_flush_rows": 0,
+            "last_flush_ms": None,
+            "max_flush_ms": None,
+            "total_flush_ms": 0.0,
+        }
+
+    def put(self, row: Dict[str, Any]) -> bool:
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            with self._stats_lock:
+                self._stats["dropped"] += 1
+            return False
+
+        depth = self._queue.qsize()
+        with self._stats_lock:
+            self._stats["enqueued"] += 1
+            if depth > self._stats["queue_high_water"]:
+                self._stats["queue_high_water"] = depth
+
+        if depth >= self.batch_size:
+            self._wakeup.set()
+        return True
+
+    def _drain(self, limit: int) -> List[Dict[str, Any]]:
+        rows = []
+        while len(rows) < limit:
+            try:
+                rows.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return rows
+
+    def _requeue(self, rows: List[Dict[str, Any]]):
+        dropped = 0
+        for row in rows:
+            try:
+                self._queue.put_nowait(row)
+            except queue.Full:
+                dropped += 1
+        if dropped:
+            with self._stats_lock:
+                self._stats["dropped"] += dropped
+
+    def flush(self) -> int:
+        """Write everything currently queued. Must run inside an app context."""
+        written = 0
+        with self._flush_lock:
+            while True:
+                rows = self._drain(self.batch_size)
+                if not rows:
+                    break
+
+                started = time.perf_counter()
+                try:
+                    self._write_rows(rows)
+                    self._db.session.commit()
+                except Exception:
+                    self._db.session.rollback()
+                    self._requeue(rows)
+                    with self._stats_lock:
+                        self._stats["failed_flushes"] += 1
+                    if self._logger:
+                        self._logger.exception("Write-behind flush of %s rows failed", len(rows))
+                    break
+
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                written += len(rows)
+                with self._stats_lock:
+                    self._stats["flushes"] += 1
+                    self._stats["written"] += len(rows)
+                    self._stats["last_flush_rows"] = len(rows)
+                    self._stats["last_flush_ms"] = round(elapsed_ms, 3)
+                    self._stats["total_flush_ms"] += elapsed_ms
+                    if self._stats["max_flush_ms"] is None or elapsed_ms > self._stats["max_flush_ms"]:
+                        self._stats["max_flush_ms"] = round(elapsed_ms, 3)
+
+                if len(rows) < self.batch_size:
+                    break
+        return written
+
+    def run(self, app):
+        with app.app_context():
+            while not self._stopped.is_set():
+                self._wakeup.wait(self.flush_interval)
+                self._wakeup.clear()
+                self.flush()
+
+    def close(self, app):
+        self._stopped.set()
+        self._wakeup.set()
+        with app.app_context():
+            self.flush()
+
+    def stats(self) -> Dict[str, Optional[float]]:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        flushes = stats.pop("flushes")
+        total_flush_ms = stats.pop("total_flush_ms")
+        stats["flushes"] = flushes
+        stats["avg_flush_ms"] = round(total_flush_ms / flushes, 3) if flushes else None
+        stats["queue_depth"] = self._queue.qsize()
+        stats["queue_capacity"] = self._queue.maxsize
+        stats["batch_size"] = self.batch_size
+        stats["flush_interval"] = self.flush_interval
+        return stats